@@ -13,7 +13,7 @@ repo_cache = {}
 file_content_cache = {}
 
 
-def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 500000, file_limit: int = 100) -> dict:
+def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 500000, file_limit: int = 100, progress_cb=None, use_cache: bool = True) -> dict:
     """
     Analyze a GitHub repository and extract folder structure, frameworks used, and file contents.
 
@@ -22,14 +22,21 @@ def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 5
         github_token (str, optional): GitHub personal access token for authentication
         max_file_size (int): Maximum file size to read (bytes)
         file_limit (int): Maximum number of files to analyze deeply
+        progress_cb (callable, optional): Called as progress_cb(fraction, description)
+            when the analysis moves to a new phase
+        use_cache (bool): Whether previously cached analyses may be returned
 
     Returns:
         dict: Analysis results including folder structure, frameworks and file contents
     """
+    def report(fraction, description):
+        if progress_cb:
+            progress_cb(fraction, description)
+
     # Check if this repo is in the persistent cache
     from app.utils import get_cached_repository_data, cache_repository_data, cache_file_content, get_cached_file_content
     
-    cached_data = get_cached_repository_data(repo_url)
+    cached_data = get_cached_repository_data(repo_url) if use_cache else None
     if cached_data:
         print(f"Using cached analysis for {repo_url}")
         
@@ -46,6 +53,7 @@ def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 5
                 file_contents[path] = content
                 
         # Build response similar to a full analysis
+        report(1.0, "Loaded repository analysis from cache")
         return {
             "folder_structure": folder_structure,
             "frameworks": frameworks,
@@ -55,8 +63,9 @@ def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 5
         }
     
     # Check if this repo is in the in-memory cache
-    if repo_url in repo_cache:
+    if use_cache and repo_url in repo_cache:
         print(f"Using in-memory cached analysis for {repo_url}")
+        report(1.0, "Loaded repository analysis from cache")
         return repo_cache[repo_url]
 
     # Parse the GitHub URL to extract owner and repo name
@@ -170,6 +179,7 @@ def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 5
         )
 
     # Get the repository contents
+    report(0.05, "Fetching repository contents...")
     try:
         contents = make_github_request(f"{base_api_url}/contents", headers)
     except Exception as e:
@@ -185,6 +195,7 @@ def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 5
     file_metadata = {}
 
     # Extract folder structure recursively with file content extraction
+    report(0.1, "Reading repository files...")
     folder_structure, file_metadata = get_folder_structure_with_contents(
         contents,
         base_api_url,
@@ -198,9 +209,11 @@ def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 5
     )
 
     # Identify frameworks used in the repository
+    report(0.8, "Detecting frameworks...")
     frameworks = identify_frameworks(folder_structure, file_contents)
 
     # Get additional information about the repository
+    report(0.9, "Fetching repository information...")
     repo_info = make_github_request(base_api_url, headers)
 
     # Package the analysis results
@@ -233,9 +246,45 @@ def analyze_repo(repo_url: str, github_token: str = None, max_file_size: int = 5
     except Exception as e:
         print(f"Warning: Failed to persist cache: {str(e)}")
 
+    report(1.0, "Repository analysis complete")
     return analysis_result
 
 
+def get_head_commit_sha(repo_url: str, github_token: str = None) -> str:
+    """
+    Get the SHA of the latest commit on the default branch of a repository
+
+    Args:
+        repo_url (str): URL of the GitHub repository
+        github_token (str, optional): GitHub personal access token for authentication
+
+    Returns:
+        str: The commit SHA, or None if it couldn't be determined
+    """
+    path_parts = urlparse(repo_url).path.strip("/").split("/")
+    if len(path_parts) < 2:
+        return None
+
+    # The sha media type returns just the SHA instead of the full commit
+    headers = {"Accept": "application/vnd.github.sha"}
+    if github_token:
+        headers["Authorization"] = f"token {github_token}"
+
+    try:
+        response = requests.get(
+            f"https://api.github.com/repos/{path_parts[0]}/{path_parts[1]}/commits/HEAD",
+            headers=headers,
+            timeout=10,
+        )
+    except requests.exceptions.RequestException as e:
+        print(f"Couldn't get the latest commit for {repo_url}: {str(e)}")
+        return None
+
+    if response.status_code != 200:
+        return None
+    return response.text.strip() or None
+
+
 def get_folder_structure_with_contents(
     contents,
     base_api_url,
@@ -3,6 +3,12 @@ import re
 import os
 import networkx as nx
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+# Below this many files the cost of starting worker processes outweighs the gain
+PARALLEL_MIN_FILES = 20
 
 
 class DependencyAnalyzer:
@@ -87,15 +93,16 @@ class DependencyAnalyzer:
             ],
         }
 
-    def analyze_dependencies(self, file_contents: dict) -> dict:
+    def _analyze_chunk(self, items, file_paths):
         """
-        Analyze dependencies between files in a repository
+        Extract imports and definitions for a subset of the repository files
 
         Args:
-            file_contents (dict): Dictionary mapping file paths to their contents
+            items (list): (file path, content) pairs to analyze
+            file_paths (list): All file paths in the repository, used to resolve imports
 
         Returns:
-            dict: Dictionary containing dependency information
+            dict: Partial imports, imported_by, definitions and extension counts
         """
         # Initialize dependency tracking
         imports = {}  # What each file imports
@@ -106,7 +113,7 @@ class DependencyAnalyzer:
         extension_counts = defaultdict(int)
 
         # Process each file
-        for file_path, content in file_contents.items():
+        for file_path, content in items:
             file_ext = os.path.splitext(file_path)[1].lower()
             extension_counts[file_ext] += 1
 
@@ -138,7 +145,7 @@ class DependencyAnalyzer:
             # Update imported_by
             for import_name in file_imports:
                 # Look for files that match the import
-                for potential_file in file_contents.keys():
+                for potential_file in file_paths:
                     # Handle Python relative imports
                     if file_ext == ".py":
                         module_name = os.path.splitext(
@@ -195,6 +202,59 @@ class DependencyAnalyzer:
 
             definitions[file_path] = file_definitions
 
+        return {
+            "imports": imports,
+            "imported_by": dict(imported_by),
+            "definitions": definitions,
+            "extension_counts": dict(extension_counts),
+        }
+
+    def analyze_dependencies(self, file_contents: dict) -> dict:
+        """
+        Analyze dependencies between files in a repository
+
+        Args:
+            file_contents (dict): Dictionary mapping file paths to their contents
+
+        Returns:
+            dict: Dictionary containing dependency information
+        """
+        file_paths = list(file_contents.keys())
+        items = list(file_contents.items())
+
+        # Per-file import/definition extraction is CPU bound, so larger repos
+        # are split into contiguous chunks and scanned in worker processes
+        workers = min(os.cpu_count() or 1, len(items))
+        partials = None
+        if len(items) >= PARALLEL_MIN_FILES and workers > 1:
+            chunk_size = -(-len(items) // workers)
+            chunks = [
+                items[i : i + chunk_size] for i in range(0, len(items), chunk_size)
+            ]
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    partials = list(
+                        executor.map(self._analyze_chunk, chunks, repeat(file_paths))
+                    )
+            except (OSError, BrokenProcessPool) as e:
+                print(f"Parallel dependency analysis failed, falling back: {e}")
+                partials = None
+        if partials is None:
+            partials = [self._analyze_chunk(items, file_paths)]
+
+        # Merge the partial results in chunk order so the output matches a serial run
+        imports = {}  # What each file imports
+        imported_by = defaultdict(list)  # Which files import this file
+        definitions = {}  # Functions/classes defined in each file
+        extension_counts = defaultdict(int)
+        for partial in partials:
+            imports.update(partial["imports"])
+            definitions.update(partial["definitions"])
+            for file_path, importers in partial["imported_by"].items():
+                imported_by[file_path].extend(importers)
+            for file_ext, count in partial["extension_counts"].items():
+                extension_counts[file_ext] += count
+
         # Build a dependency graph
         graph = nx.DiGraph()
 
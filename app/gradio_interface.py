@@ -464,99 +464,613 @@ import gradio as gr
 import requests
 import json
 import time
-import threading
 import asyncio
+import ast
 import re
 import os
-from app.analyzer import analyze_repo, analyze_code_quality
-
+import logging
+from collections import OrderedDict, defaultdict, deque
+from itertools import islice
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 # from app.visualizer import analyze_code_quality,
-from app.plagiarism_detector import PlagiarismDetector
 from app.utils import load_env
 
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to the standard library
+
+    def _json_dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    _json_loads = json.loads
+
 # Load environment variables
 load_env()
 
+logger = logging.getLogger(__name__)
+
+# Optional context blocks are only sent to Claude when the question is about them
+_QUALITY_KEYWORDS = re.compile(
+    r"\b(quality|complex\w*|lint\w*|lines?|large|smells?|metrics?|issues?"
+    r"|secur\w*|vulnerab\w*|refactor\w*)\b",
+    re.IGNORECASE,
+)
+_PLAGIARISM_KEYWORDS = re.compile(
+    r"\b(plagia\w*|cop(?:y|ied|ying)|original\w*|sources?|licen[cs]e\w*"
+    r"|copyright\w*)\b",
+    re.IGNORECASE,
+)
+
+# Single pass over the message for file references: either a quoted name with
+# an extension, or a bare path ending in a known source extension
+_FILE_MENTION_PATTERN = re.compile(
+    r"[`'\"]([^`'\"\s]+\.[a-zA-Z0-9]+)[`'\"]"
+    r"|\b([a-zA-Z0-9_\-/.]+\.(?:py|js|jsx|ts|tsx|java|html|css|cpp|c|h|cs|go|rb|php"
+    r"|json|md|ya?ml|sh|sql))\b",
+    re.IGNORECASE,
+)
+
+# (connect, read) timeouts for Claude requests; the read timeout applies
+# between streamed chunks, so long answers are not cut off
+_CLAUDE_TIMEOUT = (10, 60)
+
+# At most this many mentioned files are inlined into a single prompt, each
+# cut down to the parts most relevant to the question
+_MAX_FILES_PER_QUERY = 3
+_FILE_TOKEN_BUDGET = 1750
+
+# File contents are sent compressed unless the user asks for the code verbatim
+_FULL_CONTENT_KEYWORDS = re.compile(
+    r"\b(full|verbatim|complete|entire|exact|whole|line[- ]by[- ]line)\b",
+    re.IGNORECASE,
+)
+
+# Short factual questions get a small answer budget, everything else the
+# larger one; asking for an explanation always gets the larger budget
+_SHORT_QUESTION_PATTERN = re.compile(
+    r"^\s*(what|which|where|does|do|is|are|how many)\b",
+    re.IGNORECASE,
+)
+_DETAILED_ANSWER_KEYWORDS = re.compile(
+    r"\b(explain\w*|describe\w*|overview|architecture|walk\w*|step[- ]by[- ]step)\b",
+    re.IGNORECASE,
+)
+_SHORT_QUESTION_MAX_CHARS = 60
+_SHORT_ANSWER_MAX_TOKENS = 300
+_LONG_ANSWER_MAX_TOKENS = 1500
+
+# How Claude should use the repository context, part of the cached prompt prefix
+_GUIDANCE_PROMPT = (
+    "Guidelines:\n"
+    "- The user only sees the folder structure, summary code metrics and plagiarism results (if run).\n"
+    "- Explain frameworks, files and features from the information provided; for code questions, "
+    "analyze logic, architecture and design patterns in the file contents.\n"
+    "- Use the additional analysis and plagiarism results when relevant, without saying they were given to you separately.\n\n"
+)
+
+# Building blocks of the question suggestions shown after an analysis
+_SUGGESTIONS_HEADER = (
+    "**Repository Analysis Complete!** Here are some questions you might want to ask:\n\n"
+)
+_FRAMEWORK_SUGGESTIONS = (
+    "- What frameworks/technologies are used in this repository?\n"
+    "- Can you explain the purpose of the main frameworks?\n"
+)
+_REPOSITORY_SUGGESTIONS = (
+    "- What is the main purpose of this repository?\n"
+    "- Can you explain the overall architecture?\n"
+)
+_FILE_SUGGESTIONS = (
+    "- Can you explain how the code in [specific file] works?\n"
+    "- What are the key functions/classes in this codebase?\n"
+)
+_COMPLEXITY_SUGGESTION = (
+    "- Can you help me understand the complex functions in the code?\n"
+)
+_ISSUES_SUGGESTION = "- Are there any potential security issues in the code?\n"
+_SECURITY_SUGGESTION = "- Are there any security concerns in this codebase?\n"
+_PLAGIARISM_SUGGESTION = (
+    "- Can you explain more about the potentially plagiarized code?\n"
+)
+_CONTRIBUTE_SUGGESTION = "- How can I contribute to this project?\n"
+
+# Map file extensions to language for syntax highlighting
+_LANGUAGE_MAP = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".html": "html",
+    ".css": "css",
+    ".java": "java",
+    ".c": "c",
+    ".cpp": "cpp",
+    ".h": "c",
+    ".cs": "csharp",
+    ".go": "go",
+    ".rb": "ruby",
+    ".php": "php",
+    ".json": "json",
+    ".md": "markdown",
+    ".yml": "yaml",
+    ".yaml": "yaml",
+    ".sh": "bash",
+    ".sql": "sql",
+}
+
+# Line comment prefixes for the languages we know how to compress
+_LINE_COMMENT_PREFIXES = {
+    ".py": "#",
+    ".sh": "#",
+    ".rb": "#",
+    ".yml": "#",
+    ".yaml": "#",
+    ".js": "//",
+    ".jsx": "//",
+    ".ts": "//",
+    ".tsx": "//",
+    ".java": "//",
+    ".c": "//",
+    ".cpp": "//",
+    ".h": "//",
+    ".cs": "//",
+    ".go": "//",
+    ".php": "//",
+    ".swift": "//",
+    ".kt": "//",
+    ".rs": "//",
+}
+
+
+def _compress_source(content, file_path):
+    """
+    Cheaply shrink source code for the prompt without losing the code itself
+
+    Blank lines and whole-line comments are dropped, and Python docstrings are
+    cut down to their first line. Files in unknown languages are returned as-is.
+
+    Args:
+        content (str): Content of the file
+        file_path (str): Path of the file, used to pick the comment syntax
+
+    Returns:
+        str: Compressed content
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    comment_prefix = _LINE_COMMENT_PREFIXES.get(ext)
+    if not comment_prefix:
+        return content
+
+    lines = content.split("\n")
+
+    if ext == ".py":
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            tree = None
+
+        if tree is not None:
+            docstring_nodes = (
+                ast.Module,
+                ast.ClassDef,
+                ast.FunctionDef,
+                ast.AsyncFunctionDef,
+            )
+            for node in ast.walk(tree):
+                if not isinstance(node, docstring_nodes) or not node.body:
+                    continue
+                first = node.body[0]
+                if not (
+                    isinstance(first, ast.Expr)
+                    and isinstance(first.value, ast.Constant)
+                    and isinstance(first.value.value, str)
+                ):
+                    continue
+                start, end = first.lineno - 1, first.end_lineno - 1
+                if end <= start:
+                    continue
+                summary = first.value.value.strip().split("\n")[0]
+                indent = lines[start][: len(lines[start]) - len(lines[start].lstrip())]
+                lines[start] = f'{indent}"""{summary}"""'
+                for i in range(start + 1, end + 1):
+                    lines[i] = ""
+
+    return "\n".join(
+        line
+        for line in lines
+        if line.strip() and not line.lstrip().startswith(comment_prefix)
+    )
+
+
+# Top-level block starts for languages without a parser available here
+_BLOCK_START_PATTERN = re.compile(
+    r"^(?:export\s+)?(?:default\s+)?(?:async\s+)?"
+    r"(?:def|class|function|const|let|var|interface|func|fn|public|private|protected)\b",
+    re.MULTILINE,
+)
+_QUERY_TERM_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+# Words too common in questions or code to say anything about relevance
+_QUERY_STOPWORDS = frozenset(
+    "the and for are was what does how why where when which who this that these"
+    " those with from into about explain show tell can could would should use used"
+    " file files code function functions class classes method def return import"
+    " work works full whole entire".split()
+)
+
+
+def _split_blocks(content, file_path):
+    """
+    Split source code into top-level blocks
+
+    Args:
+        content (str): Content of the file
+        file_path (str): Path of the file, used to pick the parser
+
+    Returns:
+        list: (start, end) line ranges covering the whole file, or None if it can't be parsed
+    """
+    lines = content.split("\n")
+    if file_path.lower().endswith(".py"):
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return None
+        starts = [
+            min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+            for node in tree.body
+        ]
+    else:
+        starts = [
+            content.count("\n", 0, match.start())
+            for match in _BLOCK_START_PATTERN.finditer(content)
+        ]
+
+    # Anything before the first block (imports, headers) is a block of its own
+    starts = sorted(set([0] + starts))
+    return list(zip(starts, starts[1:] + [len(lines)]))
+
+
+def _extract_snippet(content, query, budget_tokens, file_path=""):
+    """
+    Pick the parts of a file most relevant to a question within a token budget
+
+    Top-level blocks are scored by how often the identifiers in the question
+    appear in them, and the best ones are kept in their original order. Falls
+    back to the start of the file when nothing in it matches the question.
+
+    Args:
+        content (str): Content of the file
+        query (str): The user's question
+        budget_tokens (int): Maximum number of tokens for the snippet
+        file_path (str): Path of the file, used to pick the parser
+
+    Returns:
+        str: The snippet, with "..." marking omitted code
+    """
+    if _estimate_tokens(content) <= budget_tokens:
+        return content
+
+    head = content[: budget_tokens * 4] + "..."
+    terms = {term.lower() for term in _QUERY_TERM_PATTERN.findall(query)}
+    terms -= _QUERY_STOPWORDS
+    blocks = _split_blocks(content, file_path) if terms else None
+    if not blocks:
+        return head
+
+    lines = content.split("\n")
+    scored = []
+    for index, (start, end) in enumerate(blocks):
+        text = "\n".join(lines[start:end])
+        lowered = text.lower()
+        score = sum(lowered.count(term) for term in terms)
+        if score:
+            scored.append((score, index, text))
+    if not scored:
+        return head
+
+    # Greedily take the best scoring blocks that still fit
+    chosen = []
+    remaining = budget_tokens
+    for score, index, text in sorted(scored, key=lambda item: (-item[0], item[1])):
+        cost = _estimate_tokens(text)
+        if cost <= remaining:
+            chosen.append((index, text))
+            remaining -= cost
+    if not chosen:
+        return head
+
+    chosen.sort()
+    pieces = []
+    previous = -1
+    for index, text in chosen:
+        if index != previous + 1:
+            pieces.append("...")
+        pieces.append(text)
+        previous = index
+    if previous != len(blocks) - 1:
+        pieces.append("...")
+    return "\n".join(pieces)
+
+
+# Token budget for a whole request (system prompt + history + question). The
+# newest turns are always sent verbatim, older ones as one-line summaries.
+_CONTEXT_TOKEN_BUDGET = 150_000
+_VERBATIM_TURNS = 5
+_SUMMARY_MAX_CHARS = 200
+
+# Once the unsummarized turns exceed this many tokens, all but the newest few
+# are folded into a single running summary of the conversation
+_HISTORY_FOLD_TOKENS = 6000
+_HISTORY_FOLD_KEEP_TURNS = 4
+_HISTORY_SUMMARY_MAX_LINES = 50
+
+# Only the newest turns are kept in memory; older ones live on in the summary
+_MAX_CHAT_TURNS = 200
+
+
+def _estimate_tokens(text):
+    """
+    Roughly estimate the number of tokens in a piece of text
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated token count (about 4 characters per token)
+    """
+    return len(text) // 4 + 1
+
+
+def _summarize_text(text):
+    """
+    Reduce a chat message to its first sentence, capped in length
+
+    Args:
+        text (str): Message to summarize
+
+    Returns:
+        str: One-line summary
+    """
+    stripped = text.strip()
+    first_line = stripped.split("\n", 1)[0]
+    sentence_end = first_line.find(". ")
+    if sentence_end != -1:
+        first_line = first_line[: sentence_end + 1]
+    if len(first_line) > _SUMMARY_MAX_CHARS:
+        first_line = first_line[:_SUMMARY_MAX_CHARS].rstrip()
+    if first_line != stripped:
+        first_line += " [...]"
+    return first_line
+
+
+def _max_tokens_for(user_message):
+    """
+    Pick the output token budget for a question
+
+    Args:
+        user_message (str): The user's question
+
+    Returns:
+        int: Maximum number of tokens Claude may generate for the answer
+    """
+    if (
+        len(user_message) < _SHORT_QUESTION_MAX_CHARS
+        and _SHORT_QUESTION_PATTERN.search(user_message)
+        and not _DETAILED_ANSWER_KEYWORDS.search(user_message)
+    ):
+        return _SHORT_ANSWER_MAX_TOKENS
+    return _LONG_ANSWER_MAX_TOKENS
+
+
+# Longest wait (seconds) honoured from a Retry-After header; chats run one at a
+# time, so every user waits while a request sleeps before its retry
+_MAX_RETRY_AFTER = 5.0
+
+
+class _CappedRetry(Retry):
+    """Retry policy that honours Retry-After headers only up to _MAX_RETRY_AFTER"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, _MAX_RETRY_AFTER)
+
+
+def _create_session():
+    """
+    Create the HTTP session used for Claude API calls
+
+    Returns:
+        requests.Session: Session with keep-alive connection pooling
+    """
+    session = requests.Session()
+    session.headers.update(
+        {"anthropic-version": "2023-06-01", "content-type": "application/json"}
+    )
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=10,
+            # POST is not retried by default; a Claude request has no side
+            # effects until it succeeds, so retrying it is safe. 529 means the
+            # API is overloaded. Once retries run out the last response is
+            # returned, so raise_for_status reports it with Claude's error body
+            max_retries=_CappedRetry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504, 529),
+                allowed_methods=frozenset(["POST"]),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        ),
+    )
+    return session
+
+
+# The same question submitted again this soon (seconds) after its answer is ignored
+_DUPLICATE_SUBMIT_WINDOW = 2.0
+
+# How many chat requests may be in flight at once across all users. Every
+# browser session shares one RepoChat and its chat history, so chats have to
+# run one at a time until that state is kept per session
+_CHAT_CONCURRENCY_LIMIT = 1
+
+# One connection pool per process, so TLS connections survive across chats
+_SESSION = _create_session()
+
+
+class _AnalysisCache:
+    """Small LRU cache with expiry for finished repository analyses"""
+
+    def __init__(self, capacity=32, ttl=60 * 60):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """
+        Get a cached value if it is still fresh
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        timestamp, value = entry
+        if time.time() - timestamp > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries[key] = (time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
 
 class RepoChat:
+    # Shared by all sessions in this process; keyed by the repository commit
+    # and the analysis options, so a new commit is always analyzed afresh
+    _analysis_cache = _AnalysisCache()
+
     def __init__(self):
         self.repo_analysis = None
-        self.chat_history = []
-        self.is_analyzing = False
+        self.chat_history = deque(maxlen=_MAX_CHAT_TURNS)
         self.plagiarism_results = None
-        self.file_contents = None
-        self.dependency_data = None
-
-    def analyze_repository_with_progress(
+        self.file_contents = {}
+        self.code_quality = None
+        self.dependency_data = {}
+        self._basename_index = {}
+        self._compressed_file_contents = {}
+        # Cached system prompt pieces, rebuilt after each analysis
+        self._system_prompt_static = None
+        self._quality_prompt = ""
+        self._plagiarism_prompt = ""
+        self._file_list_snippet = ""
+        # One-line summaries of older chat turns, keyed by the turn itself
+        self._turn_summaries = {}
+        # Running summary of the first _summarized_turns turns, and the
+        # estimated tokens of the turns after them
+        self._history_summary_lines = []
+        self._summarized_turns = 0
+        self._history_tokens = 0
+        # When the last turn was recorded, to spot accidental double submits
+        self._last_turn_time = 0.0
+        # Stripped question currently being answered, so a second submit of it
+        # made before the answer is recorded is ignored too
+        self._pending_question = None
+        # Turns recorded so far, including those dropped from chat_history
+        self._turn_count = 0
+        # (turn count, text) of the last conversation export
+        self._export_cache = None
+        # Keep-alive session for the Claude API, shared by all chats
+        self._http = _SESSION
+
+    async def analyze_repository_with_progress(
         self,
         repo_url,
         github_token=None,
         check_plagiarism=False,
         analyze_code=True,
         file_limit=50,
+        force_refresh=False,
         progress=gr.Progress(),
     ):
         """Analyze the repository with progress tracking"""
-        self.is_analyzing = True
         progress(0, desc="Starting repository analysis...")
 
         try:
             # Track the start time
             start_time = time.time()
 
-            # Simulate progress updates during analysis
-            # Since analyze_repo doesn't provide progress updates, we'll simulate them
-            def update_progress():
-                steps = 5
-                for i in range(1, steps + 1):
-                    if not self.is_analyzing:
-                        break
-                    time.sleep(0.5)  # Delay between updates
-                    progress(i / steps, desc=f"Analyzing repository: Phase {i}/{steps}")
+            # Analysis modules are imported on first use to keep startup fast
+            from app.analyzer import get_head_commit_sha
 
-            # Start progress updates in a separate thread
-            progress_thread = threading.Thread(target=update_progress)
-            progress_thread.start()
+            # Reuse a finished analysis of the same commit with the same options
+            commit_sha = await asyncio.to_thread(
+                get_head_commit_sha, repo_url, github_token or None
+            )
+            cache_key = (
+                (
+                    repo_url.strip().rstrip("/"),
+                    commit_sha,
+                    bool(check_plagiarism),
+                    bool(analyze_code),
+                    int(file_limit),
+                )
+                if commit_sha
+                else None
+            )
+            cached = (
+                self._analysis_cache.get(cache_key)
+                if cache_key and not force_refresh
+                else None
+            )
 
-            # Actually analyze the repository, passing the GitHub token if provided
-            try:
-                self.repo_analysis = analyze_repo(
+            if cached:
+                progress(0.9, desc="Loaded analysis from cache")
+                self.repo_analysis, self.code_quality, self.plagiarism_results = cached
+            else:
+                await self._run_analysis(
                     repo_url,
-                    github_token=github_token if github_token else None,
-                    file_limit=file_limit,
+                    github_token,
+                    check_plagiarism,
+                    analyze_code,
+                    file_limit,
+                    force_refresh,
+                    progress,
                 )
-
-                # Store file contents for use in queries
-                self.file_contents = self.repo_analysis.get("file_contents", {})
-
-                # Get code quality metrics if requested
-                if analyze_code and self.file_contents:
-                    progress(0.7, desc="Analyzing code quality...")
-                    self.code_quality = analyze_code_quality(self.file_contents)
-                else:
-                    self.code_quality = None
-
-            except Exception as e:
-                if "rate limit exceeded" in str(e).lower():
-                    raise Exception(
-                        f"GitHub API rate limit exceeded. Please provide a GitHub token or try again later. Error: {str(e)}"
+                if cache_key:
+                    self._analysis_cache.put(
+                        cache_key,
+                        (self.repo_analysis, self.code_quality, self.plagiarism_results),
                     )
-                else:
-                    raise e
-
-            # Check for plagiarism if requested
-            if check_plagiarism:
-                progress(0.8, desc="Checking for potential plagiarism...")
-                plagiarism_detector = PlagiarismDetector(github_token=github_token)
-                self.plagiarism_results = plagiarism_detector.detect_plagiarism(
-                    repo_url
-                )
-            else:
-                self.plagiarism_results = None
 
-            # Stop the progress updates
-            self.is_analyzing = False
-            progress_thread.join()
+            # Store file contents for use in queries
+            self.file_contents = self.repo_analysis.get("file_contents", {})
+            self._basename_index = self._build_basename_index(self.file_contents)
+            self._compressed_file_contents = {}
 
             # Calculate time taken
             elapsed_time = time.time() - start_time
@@ -570,7 +1084,8 @@ class RepoChat:
             analyzed_files_count = len(self.file_contents) if self.file_contents else 0
 
             # Format the repository analysis as markdown for better display
-            analysis_markdown = f"""
+            parts = [
+                f"""
 ## Repository Analysis Results
 *Analysis completed in {elapsed_time:.2f} seconds*
 
@@ -582,55 +1097,63 @@ class RepoChat:
 ### Files Analyzed
 - Total files analyzed: {analyzed_files_count}
 """
+            ]
 
             # Add frameworks section if available
             if frameworks:
-                analysis_markdown += f"""
+                parts.append(
+                    f"""
 ### Detected Frameworks/Technologies
 {', '.join(frameworks)}
 """
+                )
 
             # Add code quality information if available
             if self.code_quality:
-                analysis_markdown += f"""
+                parts.append(
+                    f"""
 ### Code Quality Metrics
 - Total lines of code: {self.code_quality['total_lines']}
 - Blank lines: {self.code_quality['blank_lines']}
 - Large files (>500 lines): {len(self.code_quality['large_files'])}
 - Complex functions: {len(self.code_quality['complex_functions'])}
 """
+                )
 
                 if self.code_quality["large_files"]:
-                    analysis_markdown += "\n#### Large Files\n"
-                    for file in self.code_quality["large_files"][
-                        :5
-                    ]:  # Show up to 5 large files
-                        analysis_markdown += (
-                            f"- {file['path']} ({file['lines']} lines)\n"
-                        )
+                    parts.append("\n#### Large Files\n")
+                    parts.extend(  # Show up to 5 large files
+                        f"- {file['path']} ({file['lines']} lines)\n"
+                        for file in self.code_quality["large_files"][:5]
+                    )
 
                     if len(self.code_quality["large_files"]) > 5:
-                        analysis_markdown += f"- ... and {len(self.code_quality['large_files']) - 5} more\n"
+                        parts.append(
+                            f"- ... and {len(self.code_quality['large_files']) - 5} more\n"
+                        )
 
             # Add plagiarism information if available
             if self.plagiarism_results:
-                analysis_markdown += f"""
+                parts.append(
+                    f"""
 ### Plagiarism Check Results
 {self.plagiarism_results['summary']}
 
 """
+                )
                 if self.plagiarism_results["plagiarism_detected"]:
-                    analysis_markdown += "#### Suspicious Files:\n"
-                    for file in self.plagiarism_results["suspicious_files"]:
-                        analysis_markdown += f"- **{file['file']}** - {file['match_type']} (Confidence: {int(file['confidence']*100)}%)\n"
-                        analysis_markdown += (
-                            f"  - Potential source: {file['potential_source']}\n"
-                        )
+                    parts.append("#### Suspicious Files:\n")
+                    parts.extend(
+                        f"- **{file['file']}** - {file['match_type']} (Confidence: {int(file['confidence']*100)}%)\n"
+                        f"  - Potential source: {file['potential_source']}\n"
+                        for file in self.plagiarism_results["suspicious_files"]
+                    )
 
             # Add additional repository information
             repo_info = additional_info
             if isinstance(repo_info, dict):
-                analysis_markdown += f"""
+                parts.append(
+                    f"""
 ### Repository Information
 - Description: {repo_info.get('description', 'Not provided')}
 - Primary language: {repo_info.get('language', 'Not detected')}
@@ -639,220 +1162,484 @@ class RepoChat:
 - Open issues: {repo_info.get('open_issues', 0)}
 - Last updated: {repo_info.get('last_update', 'Unknown')}
 """
+                )
+
+            analysis_markdown = "".join(parts)
 
             # Store frameworks and additional info for chat suggestions
             self.frameworks_info = frameworks
             self.additional_info = additional_info
 
-            # Reset chat history with the system message and initial suggestions
-            self.chat_history = []
+            # The repository part of the Claude system prompt is rebuilt on the next query
+            self._invalidate_system_prompt()
 
-            # Create initial suggestions message
-            suggestions = "**Repository Analysis Complete!** Here are some questions you might want to ask:\n\n"
+            # Reset chat history with the system message and initial suggestions
+            self.clear_chat_history()
 
+            # Create initial suggestions message from the fixed question blocks
+            parts = [_SUGGESTIONS_HEADER]
             if frameworks:
-                suggestions += (
-                    "- What frameworks/technologies are used in this repository?\n"
-                )
-                suggestions += "- Can you explain the purpose of the main frameworks?\n"
-
-            suggestions += "- What is the main purpose of this repository?\n"
-            suggestions += "- Can you explain the overall architecture?\n"
-
+                parts.append(_FRAMEWORK_SUGGESTIONS)
+            parts.append(_REPOSITORY_SUGGESTIONS)
             if self.file_contents:
-                suggestions += (
-                    "- Can you explain how the code in [specific file] works?\n"
-                )
-                suggestions += (
-                    "- What are the key functions/classes in this codebase?\n"
-                )
-
+                parts.append(_FILE_SUGGESTIONS)
             if self.code_quality and self.code_quality["complex_functions"]:
-                suggestions += (
-                    "- Can you help me understand the complex functions in the code?\n"
-                )
-
+                parts.append(_COMPLEXITY_SUGGESTION)
             if self.code_quality and self.code_quality["potential_issues"]:
-                suggestions += (
-                    "- Are there any potential security issues in the code?\n"
-                )
-
-            suggestions += "- Are there any security concerns in this codebase?\n"
-
+                parts.append(_ISSUES_SUGGESTION)
+            parts.append(_SECURITY_SUGGESTION)
             if (
                 self.plagiarism_results
                 and self.plagiarism_results["plagiarism_detected"]
             ):
-                suggestions += (
-                    "- Can you explain more about the potentially plagiarized code?\n"
-                )
-
-            suggestions += "- How can I contribute to this project?\n"
+                parts.append(_PLAGIARISM_SUGGESTION)
+            parts.append(_CONTRIBUTE_SUGGESTION)
+            suggestions = "".join(parts)
 
             # Return both the analysis markdown and the suggestions for the chatbot in tuple format
             return analysis_markdown, [(None, suggestions)]
 
         except Exception as e:
             error_message = f"Error analyzing repository: {str(e)}"
-            self.chat_history = []
-            self.is_analyzing = False
-            if "progress_thread" in locals() and progress_thread.is_alive():
-                progress_thread.join()
+            self.clear_chat_history()
             progress(1.0, desc="Analysis failed!")
             return error_message, [
                 (None, "Error analyzing repository. Please try again.")
             ]
 
-    def query_claude(self, user_message, progress=gr.Progress(), status_updates=None):
-        """Send a query to Claude API with the repository context and chat history"""
-        if not self.repo_analysis:
-            return "Please analyze a repository first."
-
-        # Use the status updates if provided, otherwise use the progress bar
-        if status_updates:
-            current_status = status_updates[0]
+    async def _run_analysis(
+        self,
+        repo_url,
+        github_token,
+        check_plagiarism,
+        analyze_code,
+        file_limit,
+        force_refresh,
+        progress,
+    ):
+        """Run the repository, code quality and plagiarism analyses"""
+        # Both branches run at the same time, so the bar shows their
+        # combined progress, weighted by how long each usually takes
+        if check_plagiarism:
+            weights = {"repo": 0.7, "plagiarism": 0.25}
         else:
-            progress(0.1, desc="Preparing request...")
-            current_status = "Preparing request..."
+            weights = {"repo": 0.95}
+        done = {}
+        # gr.Progress is not documented as thread-safe, so the worker threads
+        # only record their progress and the bar is updated on the event loop
+        loop = asyncio.get_running_loop()
 
-        # For debugging - print API information instead of showing to user
-        print(f"Starting Claude API request for message: {user_message[:50]}...")
+        def show_progress(desc):
+            overall = sum(w * done.get(b, 0.0) for b, w in weights.items())
+            progress(overall, desc=desc)
 
-        # Get API key from environment variables
-        api_key = load_env().get("API_KEY")
+        def progress_for(branch, start=0.0, end=1.0):
+            def report(fraction, desc):
+                done[branch] = start + fraction * (end - start)
+                loop.call_soon_threadsafe(show_progress, desc)
 
-        if not api_key:
-            return "Error: API_KEY not found in environment variables"
+            return report
 
-        # Create system message with repository context
-        system_message = (
-            f"You are assisting with a GitHub repository analysis. Here is the information about the repository:\n\n"
-            f"Folder Structure:\n{self.repo_analysis['folder_structure']}\n\n"
-            f"Frameworks:\n{self.repo_analysis['frameworks']}\n\n"
-            f"Additional Analysis:\n{self.repo_analysis.get('additional_info', '')}\n\n"
-        )
+        async def analyze_repository():
+            from app.analyzer import analyze_code_quality, analyze_repo
 
-        # Add code quality information if available
-        if hasattr(self, "code_quality") and self.code_quality:
-            system_message += "Code Quality Metrics:\n"
-            system_message += (
-                f"- Total lines of code: {self.code_quality['total_lines']}\n"
-            )
-            system_message += f"- Blank lines: {self.code_quality['blank_lines']}\n"
+            # Actually analyze the repository, passing the GitHub token if provided
+            try:
+                repo_analysis = await asyncio.to_thread(
+                    analyze_repo,
+                    repo_url,
+                    github_token=github_token if github_token else None,
+                    file_limit=file_limit,
+                    progress_cb=progress_for("repo", 0.0, 0.9),
+                    use_cache=not force_refresh,
+                )
 
-            if self.code_quality["large_files"]:
-                system_message += (
-                    f"- Large files: {len(self.code_quality['large_files'])}\n"
+                # Get code quality metrics if requested
+                file_contents = repo_analysis.get("file_contents", {})
+                code_quality = None
+                if analyze_code and file_contents:
+                    progress_for("repo")(0.9, "Analyzing code quality...")
+                    code_quality = await asyncio.to_thread(
+                        analyze_code_quality, file_contents
+                    )
+                return repo_analysis, code_quality
+
+            except Exception as e:
+                if "rate limit exceeded" in str(e).lower():
+                    raise Exception(
+                        f"GitHub API rate limit exceeded. Please provide a GitHub token or try again later. Error: {str(e)}"
+                    ) from e
+                raise
+
+        async def check_for_plagiarism():
+            # Check for plagiarism if requested
+            if not check_plagiarism:
+                return None
+            from app.plagiarism_detector import PlagiarismDetector
+
+            with PlagiarismDetector(github_token=github_token) as plagiarism_detector:
+                return await asyncio.to_thread(
+                    plagiarism_detector.detect_plagiarism,
+                    repo_url,
+                    progress_cb=progress_for("plagiarism"),
                 )
-                for file in self.code_quality["large_files"][:5]:  # Show top 5
-                    system_message += f"  - {file['path']} ({file['lines']} lines)\n"
 
-            if self.code_quality["complex_functions"]:
-                system_message += f"- Complex functions: {len(self.code_quality['complex_functions'])}\n"
-                for func in self.code_quality["complex_functions"][:5]:  # Show top 5
-                    system_message += f"  - {func['file']}: {func['function']} ({func['lines']} lines)\n"
+        # Both are dominated by GitHub requests, so neither waits for the other
+        (self.repo_analysis, self.code_quality), self.plagiarism_results = (
+            await asyncio.gather(analyze_repository(), check_for_plagiarism())
+        )
 
-            if self.code_quality["potential_issues"]:
-                system_message += f"- Potential issues: {len(self.code_quality['potential_issues'])}\n"
-                for issue in self.code_quality["potential_issues"][:5]:  # Show top 5
-                    system_message += (
-                        f"  - {issue['file']} line {issue['line']}: {issue['issue']}\n"
-                    )
+    def _build_basename_index(self, file_contents):
+        """Map every trailing path fragment (lowercased) to the files ending with it"""
+        index = defaultdict(list)
+        for path in file_contents:
+            parts = path.lower().split("/")
+            for i in range(len(parts)):
+                index["/".join(parts[i:])].append(path)
+        return dict(index)
+
+    def _invalidate_system_prompt(self):
+        """Mark the cached system prompt as stale after the repository context changed"""
+        self._system_prompt_static = None
+
+    def _build_static_system_prompt(self):
+        """Assemble the parts of the Claude system prompt that only change on re-analysis"""
+        # Create system message with repository context
+        parts = [
+            "You are assisting with a GitHub repository analysis. Here is the information about the repository:\n\n",
+            f"Folder Structure:\n{self.repo_analysis['folder_structure']}\n\n",
+            f"Frameworks:\n{self.repo_analysis['frameworks']}\n\n",
+            f"Additional Analysis:\n{self.repo_analysis.get('additional_info', '')}\n\n",
+        ]
 
         # Add dependency information if available
-        if hasattr(self, "dependency_data") and self.dependency_data:
-            system_message += "\nCode Dependency Analysis:\n"
-
+        if self.dependency_data:
             metrics = self.dependency_data.get("metrics", {})
             key_files = self.dependency_data.get("key_files", [])[:3]
 
-            system_message += f"- Key files: {', '.join([f[0] for f in key_files])}\n"
-            system_message += f"- Entry points: {', '.join(self.dependency_data.get('entry_points', [])[:3])}\n"
-            system_message += f"- Average dependencies per file: {metrics.get('avg_dependencies', 0):.2f}\n"
+            parts.append("\nCode Dependency Analysis:\n")
+            parts.append(f"- Key files: {', '.join([f[0] for f in key_files])}\n")
+            parts.append(
+                f"- Entry points: {', '.join(self.dependency_data.get('entry_points', [])[:3])}\n"
+            )
+            parts.append(
+                f"- Average dependencies per file: {metrics.get('avg_dependencies', 0):.2f}\n"
+            )
+
+        # List up to 20 files to avoid token limits, without copying the key list
+        self._file_list_snippet = ""
+        if self.file_contents:
+            listed = [f"- {file_path}\n" for file_path in islice(self.file_contents, 20)]
+            if len(self.file_contents) > 20:
+                listed.append(f"- ... and {len(self.file_contents) - 20} more files\n")
+            self._file_list_snippet = "".join(listed)
 
         # Add file contents information
         if self.file_contents:
-            system_message += f"\nFile Contents:\n"
-            system_message += f"I have access to the contents of {len(self.file_contents)} files from this repository.\n"
-            system_message += "If the user asks about specific files or code implementation, I should provide detailed explanations based on these file contents.\n\n"
+            parts.append("\nFile Contents:\n")
+            parts.append(
+                f"I have access to the contents of {len(self.file_contents)} files from this repository.\n"
+            )
+            parts.append(
+                "If the user asks about specific files or code implementation, I should provide detailed explanations based on these file contents.\n\n"
+            )
 
             # Provide a list of files that have been analyzed
-            system_message += "Files available for detailed analysis:\n"
-            file_list = list(self.file_contents.keys())
-            for file_path in file_list[
-                :20
-            ]:  # List up to 20 files to avoid token limits
-                system_message += f"- {file_path}\n"
-            if len(file_list) > 20:
-                system_message += f"- ... and {len(file_list) - 20} more files\n"
+            parts.append("Files available for detailed analysis:\n")
+            parts.append(self._file_list_snippet)
 
             # Add important context: when user asks about a specific file, provide its content
-            system_message += "\nIf the user asks about a specific file, find its content in the file_contents dictionary and explain the code in detail."
+            parts.append(
+                "\nIf the user asks about a specific file, find its content in the file_contents dictionary and explain the code in detail.\n\n"
+            )
+
+        parts.append(_GUIDANCE_PROMPT)
+        self._system_prompt_static = "".join(parts)
 
-        # Add plagiarism information if available
+        # Code quality block, only sent when the question is about quality
+        parts = []
+        if self.code_quality:
+            parts.append("Code Quality Metrics:\n")
+            parts.append(f"- Total lines of code: {self.code_quality['total_lines']}\n")
+            parts.append(f"- Blank lines: {self.code_quality['blank_lines']}\n")
+
+            if self.code_quality["large_files"]:
+                parts.append(f"- Large files: {len(self.code_quality['large_files'])}\n")
+                parts.extend(  # Show top 5
+                    f"  - {file['path']} ({file['lines']} lines)\n"
+                    for file in self.code_quality["large_files"][:5]
+                )
+
+            if self.code_quality["complex_functions"]:
+                parts.append(
+                    f"- Complex functions: {len(self.code_quality['complex_functions'])}\n"
+                )
+                parts.extend(  # Show top 5
+                    f"  - {func['file']}: {func['function']} ({func['lines']} lines)\n"
+                    for func in self.code_quality["complex_functions"][:5]
+                )
+
+            if self.code_quality["potential_issues"]:
+                parts.append(
+                    f"- Potential issues: {len(self.code_quality['potential_issues'])}\n"
+                )
+                parts.extend(  # Show top 5
+                    f"  - {issue['file']} line {issue['line']}: {issue['issue']}\n"
+                    for issue in self.code_quality["potential_issues"][:5]
+                )
+        self._quality_prompt = "".join(parts)
+
+        # Plagiarism block, only sent when the question is about plagiarism
+        parts = []
         if self.plagiarism_results:
-            system_message += (
+            parts.append(
                 f"Plagiarism Check Results:\n{self.plagiarism_results['summary']}\n\n"
             )
             if self.plagiarism_results["plagiarism_detected"]:
-                system_message += "Suspicious Files:\n"
-                for file in self.plagiarism_results["suspicious_files"]:
-                    system_message += (
-                        f"- {file['file']} - {file['match_type']} (Confidence: {int(file['confidence']*100)}%)\n"
-                        f"  Potential source: {file['potential_source']}\n"
-                        f"  Snippet: {file['snippet']}\n\n"
-                    )
+                parts.append("Suspicious Files:\n")
+                parts.extend(
+                    f"- {file['file']} - {file['match_type']} (Confidence: {int(file['confidence']*100)}%)\n"
+                    f"  Potential source: {file['potential_source']}\n"
+                    f"  Snippet: {file['snippet']}\n\n"
+                    for file in self.plagiarism_results["suspicious_files"]
+                )
+        self._plagiarism_prompt = "".join(parts)
+
+    def _get_file_context(self, file_path, full=False):
+        """Return a file's content for the prompt, compressed unless asked for in full"""
+        if full:
+            return self.file_contents[file_path]
+
+        compressed = self._compressed_file_contents.get(file_path)
+        if compressed is None:
+            compressed = _compress_source(self.file_contents[file_path], file_path)
+            self._compressed_file_contents[file_path] = compressed
+        return compressed
+
+    def _summarize_turn(self, human_msg, ai_msg):
+        """
+        Get the cached one-line summary of an older chat turn
+
+        Args:
+            human_msg (str): User message of the turn
+            ai_msg (str): Claude response of the turn
+
+        Returns:
+            tuple: Summarized (user message, response) pair
+        """
+        key = (human_msg, ai_msg)
+        summary = self._turn_summaries.get(key)
+        if summary is None:
+            summary = (_summarize_text(human_msg), _summarize_text(ai_msg))
+            self._turn_summaries[key] = summary
+        return summary
+
+    def _is_duplicate_submit(self, user_message):
+        """
+        Check whether a message repeats the question being answered, or the last
+        question within a moment of its answer
+
+        Args:
+            user_message (str): Message that was just submitted
+
+        Returns:
+            bool: True if the message should be ignored as an accidental resubmission
+        """
+        if self._pending_question == user_message.strip():
+            return True
+        if not self.chat_history or self.chat_history[-1][0] is None:
+            return False
+        return (
+            self.chat_history[-1][0].strip() == user_message.strip()
+            and time.time() - self._last_turn_time < _DUPLICATE_SUBMIT_WINDOW
+        )
 
-        # If the user asks about a specific file, include the file's content in the system message
-        # Check if the user is asking about a specific file
-        file_pattern = r"(?:explain|tell me about|analyze|what does|how does|show me|look at).*?(`|\'|\")([^`\'\"]+\.[a-zA-Z0-9]+)(`|\'|\")"
-        file_mentions = re.findall(file_pattern, user_message, re.IGNORECASE)
+    def _record_turn(self, user_message, response):
+        """
+        Add a finished turn to the chat history, folding older turns when it grows too large
+
+        Args:
+            user_message (str): User message of the turn
+            response (str): Claude response of the turn
+        """
+        if len(self.chat_history) >= _MAX_CHAT_TURNS:
+            # The oldest turn is about to be dropped from the history
+            if self._summarized_turns:
+                self._summarized_turns -= 1
+            else:
+                human_msg, ai_msg = self.chat_history[0]
+                self._history_tokens -= _estimate_tokens(
+                    human_msg or ""
+                ) + _estimate_tokens(ai_msg)
+        self.chat_history.append((user_message, response))
+        self._turn_count += 1
+        self._last_turn_time = time.time()
+        self._history_tokens += _estimate_tokens(user_message) + _estimate_tokens(
+            response
+        )
+        if self._history_tokens <= _HISTORY_FOLD_TOKENS:
+            return
+
+        fold_until = len(self.chat_history) - _HISTORY_FOLD_KEEP_TURNS
+        for human_msg, ai_msg in islice(
+            self.chat_history, self._summarized_turns, fold_until
+        ):
+            if human_msg is None:  # Skip system messages
+                continue
+            human_summary, ai_summary = self._summarize_turn(human_msg, ai_msg)
+            self._history_summary_lines.append(
+                f"- User: {human_summary}\n  Claude: {ai_summary}"
+            )
+            self._history_tokens -= _estimate_tokens(human_msg) + _estimate_tokens(
+                ai_msg
+            )
+        del self._history_summary_lines[:-_HISTORY_SUMMARY_MAX_LINES]
+        self._summarized_turns = max(self._summarized_turns, fold_until)
+        # Summaries of folded turns are no longer needed individually
+        self._turn_summaries = {}
+
+    def _build_history_messages(self, system_message, user_message):
+        """
+        Select past chat turns, newest first, until the token budget is spent
+
+        The newest turns are kept verbatim and older ones are replaced by their
+        summaries. The walk stops at the first turn that no longer fits.
+
+        Args:
+            system_message (str): System prompt of the request
+            user_message (str): Current user message
+
+        Returns:
+            list: Messages for the Claude API, oldest first
+        """
+        budget = (
+            _CONTEXT_TOKEN_BUDGET
+            - _estimate_tokens(system_message)
+            - _estimate_tokens(user_message)
+        )
+
+        # Folded turns are sent as one summary exchange ahead of the rest
+        summary_turn = None
+        if self._history_summary_lines:
+            summary_turn = (
+                "Summary of our earlier conversation:\n"
+                + "\n".join(self._history_summary_lines),
+                "Understood, I'll keep that context in mind.",
+            )
+            budget -= _estimate_tokens(summary_turn[0]) + _estimate_tokens(
+                summary_turn[1]
+            )
 
-        # Alternative pattern to catch more file references
-        alt_pattern = r"(?:file|code in|implementation of|content of).*?(`|\'|\")([^`\'\"]+\.[a-zA-Z0-9]+)(`|\'|\")"
-        file_mentions.extend(re.findall(alt_pattern, user_message, re.IGNORECASE))
+        selected = []
+        recent_turns = list(islice(self.chat_history, self._summarized_turns, None))
+        for human_msg, ai_msg in reversed(recent_turns):
+            if human_msg is None:  # Skip system messages
+                continue
+            if len(selected) >= _VERBATIM_TURNS:
+                human_msg, ai_msg = self._summarize_turn(human_msg, ai_msg)
+            cost = _estimate_tokens(human_msg) + _estimate_tokens(ai_msg)
+            if cost > budget:
+                break
+            budget -= cost
+            selected.append((human_msg, ai_msg))
+        if summary_turn and budget >= 0:
+            selected.append(summary_turn)
+
+        messages = []
+        for human_msg, ai_msg in reversed(selected):
+            messages.append({"role": "user", "content": human_msg})
+            messages.append({"role": "assistant", "content": ai_msg})
+        return messages
+
+    def stream_claude(self, user_message, progress=gr.Progress(), status_updates=None):
+        """
+        Stream Claude's answer to a query with the repository context and chat history
+
+        Yields:
+            str: The response text received so far
+        """
+        if not user_message or not user_message.strip():
+            yield "Please enter a question."
+            return
 
-        # Also check for direct file paths without quotes but with extensions
-        direct_pattern = r"\b([a-zA-Z0-9_\-\/\.]+\.(py|js|java|html|css|jsx|tsx|cpp|c|h|cs|go|rb|php|ts))\b"
-        direct_matches = re.findall(direct_pattern, user_message, re.IGNORECASE)
-        if direct_matches:
-            file_mentions.extend([('"', match[0], '"') for match in direct_matches])
+        if not self.repo_analysis:
+            yield "Please analyze a repository first."
+            return
+
+        # The caller shows its own status updates; otherwise use the progress bar
+        if not status_updates:
+            progress(0.1, desc="Preparing request...")
+
+        logger.debug("Claude req: %.50s", user_message)
+
+        # Get API key from environment variables
+        api_key = load_env().get("API_KEY")
+
+        if not api_key:
+            yield "Error: API_KEY not found in environment variables"
+            return
+
+        # Repository context is built on the first query after it changes; only
+        # the optional blocks and the mentioned files vary between turns
+        if self._system_prompt_static is None:
+            self._build_static_system_prompt()
+        parts = [self._system_prompt_static]
+
+        # Add code quality information if relevant to the question
+        if self._quality_prompt and _QUALITY_KEYWORDS.search(user_message):
+            parts.append(self._quality_prompt)
+
+        # Add plagiarism information if relevant to the question
+        if self._plagiarism_prompt and _PLAGIARISM_KEYWORDS.search(user_message):
+            parts.append(self._plagiarism_prompt)
+
+        # If the user asks about a specific file, include the file's content in the system message
+        # Check if the user is asking about a specific file
+        file_mentions = [
+            quoted or bare for quoted, bare in _FILE_MENTION_PATTERN.findall(user_message)
+        ]
 
         # If files are mentioned, try to find them in our file_contents
         if file_mentions and self.file_contents:
-            for _, file_path, _ in file_mentions:
+            want_full = bool(_FULL_CONTENT_KEYWORDS.search(user_message))
+            # Each file is included once, and only the first few mentioned
+            included = set()
+            for file_path in file_mentions:
+                if len(included) >= _MAX_FILES_PER_QUERY:
+                    break
+
                 # Try exact match first
                 if file_path in self.file_contents:
-                    file_content = self.file_contents[file_path]
-                    system_message += f"\n\nContent of file '{file_path}':\n```\n{file_content[:7000]}{'...' if len(file_content) > 7000 else ''}\n```\n"
+                    best_match = file_path
                 else:
-                    # Try partial match
-                    matching_files = [
-                        f for f in self.file_contents.keys() if file_path in f
-                    ]
-                    if matching_files:
-                        best_match = matching_files[0]
-                        file_content = self.file_contents[best_match]
-                        system_message += f"\n\nContent of file '{best_match}' (matching '{file_path}'):\n```\n{file_content[:7000]}{'...' if len(file_content) > 7000 else ''}\n```\n"
-
-        system_message += (
-            f"While you have all this information, the user only sees the folder structure, a summary of code metrics, and plagiarism results if performed. "
-            f"If they ask about frameworks or technologies, explain them based on the frameworks information I've provided to you. "
-            f"If they ask about specific files or code, use the file contents I've provided to give detailed explanations. "
-            f"Analyze the code logic and structure to provide meaningful insights about implementation details, architecture, and design patterns. "
-            f"If asked about a specific function or feature, find relevant code in the file contents and explain how it works. "
-            f"Similarly, use the additional analysis information when relevant, but don't directly mention that you were given this data separately. "
-            f"If they ask about plagiarism, provide insights based on the plagiarism check results if available."
-        )
+                    # Try partial match, via the path-suffix index first
+                    matching_files = self._basename_index.get(
+                        file_path.lower().removeprefix("./")
+                    ) or [f for f in self.file_contents.keys() if file_path in f]
+                    if not matching_files:
+                        continue
+                    best_match = matching_files[0]
+
+                if best_match in included:
+                    continue
+                included.add(best_match)
+
+                file_content = self._get_file_context(best_match, want_full)
+                label = (
+                    f"'{best_match}'"
+                    if best_match == file_path
+                    else f"'{best_match}' (matching '{file_path}')"
+                )
+                snippet = _extract_snippet(
+                    file_content, user_message, _FILE_TOKEN_BUDGET, best_match
+                )
+                parts.append(f"\n\nContent of file {label}:\n```\n{snippet}\n```\n")
 
-        # Prepare messages for Claude API (without the system role)
-        messages = []
+        system_message = "".join(parts)
 
-        # Add chat history to the messages (limit to last 10 exchanges to avoid token limits)
-        for human_msg, ai_msg in self.chat_history[-10:]:
-            if human_msg is not None:  # Skip system messages
-                messages.append({"role": "user", "content": human_msg})
-                messages.append({"role": "assistant", "content": ai_msg})
+        # Prepare messages for Claude API (without the system role), keeping
+        # as much history as fits in the token budget
+        messages = self._build_history_messages(system_message, user_message)
 
         # Add the current user message
         messages.append({"role": "user", "content": user_message})
@@ -860,76 +1647,124 @@ class RepoChat:
         # Prepare the payload for Claude API - correcting payload format
         payload = {
             "model": "claude-3-7-sonnet-20250219",
-            "max_tokens": 1000,
+            "max_tokens": _max_tokens_for(user_message),
             "system": system_message,  # Use top-level system parameter instead of in messages
             "messages": messages,
             "temperature": 0.7,
+            "stream": True,
         }
 
-        # Set headers with API key - using correct header format
-        headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json",
-        }
+        # The API version and content type are set on the session
+        headers = {"x-api-key": api_key}
 
-        # For debugging - print the request payload instead of showing to user
-        print(
-            "Sending request to Claude API with payload:", json.dumps(payload, indent=2)
-        )
+        # Encode the payload once; the session already sends the JSON content type
+        body = _json_dumps(payload)
+        logger.debug("payload keys=%s size=%d", list(payload), len(body))
 
-        if status_updates and len(status_updates) > 2:
-            current_status = status_updates[2]
-        else:
+        if not status_updates or len(status_updates) <= 2:
             progress(0.5, desc="Sending request to Claude API...")
-            current_status = "Sending request to Claude API..."
 
-        # Send the request to the Claude API
+        # Send the request to the Claude API and read the answer as it streams in
+        claude_response = ""
         try:
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages", json=payload, headers=headers
-            )
-
-            # For debugging - print response status and headers instead of showing to user
-            print(f"Response status: {response.status_code}")
-            print(
-                f"Response: {response.text[:1000]}"
-            )  # Print first 1000 chars of response
-
-            response.raise_for_status()
-
-            if not status_updates:
-                progress(0.8, desc="Processing response...")
-
-            # Extract the response content
-            result = response.json()
-            if "content" in result and len(result["content"]) > 0:
-                claude_response = result["content"][0]["text"]
-
-                # Update chat history
-                self.chat_history.append((user_message, claude_response))
+            # The context manager hands the pooled connection back even when
+            # the stream is left early
+            with self._http.post(
+                "https://api.anthropic.com/v1/messages",
+                data=body,
+                headers=headers,
+                stream=True,
+                timeout=_CLAUDE_TIMEOUT,
+            ) as response:
+                # For debugging - log the response status
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Response status: %s", response.status_code)
+
+                response.raise_for_status()
 
+                if not status_updates:
+                    progress(0.8, desc="Receiving response...")
+
+                # Server-sent events: only text deltas and errors matter here
+                # Lines are parsed as raw bytes, without decoding them to str first
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    event = _json_loads(line[5:])
+                    event_type = event.get("type")
+                    if event_type == "content_block_delta":
+                        delta = event.get("delta", {})
+                        if delta.get("type") == "text_delta":
+                            claude_response += delta["text"]
+                            yield claude_response
+                    elif event_type == "error":
+                        message = event.get("error", {}).get("message", "Unknown error")
+                        if not status_updates:
+                            progress(1.0, desc="Error!")
+                        yield f"Error querying Claude API: {message}"
+                        return
+
+            if claude_response:
                 if not status_updates:
                     progress(1.0, desc="Response ready!")
-                return claude_response
             else:
                 if not status_updates:
                     progress(1.0, desc="No response content!")
-                return "No response content from Claude."
+                yield "No response content from Claude."
 
-        except requests.exceptions.RequestException as e:
+        except requests.exceptions.HTTPError as e:
+            # Raised by raise_for_status before anything was streamed, so the
+            # (short) error body can still be read
             if not status_updates:
                 progress(1.0, desc="Error!")
             error_details = (
-                response.text if "response" in locals() else "No response details"
+                e.response.text if e.response is not None else "No response details"
             )
-            print(f"API Error details: {error_details}")
-            return f"Error querying Claude API: {str(e)}\n\nDetails: {error_details}"
+            logger.error("API Error details: %s", error_details)
+            yield f"Error querying Claude API: {str(e)}\n\nDetails: {error_details}"
+
+        except requests.exceptions.RequestException as e:
+            # The connection failed or broke off mid-stream; the body can't be
+            # read again, so keep whatever part of the answer already arrived
+            if not status_updates:
+                progress(1.0, desc="Error!")
+            logger.error("API Error: %s", e)
+            error_message = f"Error querying Claude API: {str(e)}"
+            yield f"{claude_response}\n\n{error_message}" if claude_response else error_message
+
+    def query_claude(self, user_message, progress=gr.Progress(), status_updates=None):
+        """Send a query to Claude API with the repository context and chat history"""
+        if not user_message or not user_message.strip():
+            return "Please enter a question."
+        if self._is_duplicate_submit(user_message):
+            if self._pending_question is not None:
+                return "This question is already being answered."
+            return self.chat_history[-1][1]
+
+        claude_response = ""
+        self._pending_question = user_message.strip()
+        try:
+            for claude_response in self.stream_claude(
+                user_message, progress, status_updates=status_updates
+            ):
+                pass
+        finally:
+            self._pending_question = None
+
+        # Update chat history
+        self._record_turn(user_message, claude_response)
+        return claude_response
 
     def chat(self, user_message, history, progress=gr.Progress()):
-        """Process a chat message and update the history"""
+        """Process a chat message and stream the answer into the history"""
         if not user_message.strip():
-            return history, "Please enter a question."
+            yield history, "Please enter a question."
+            return
+
+        # The Enter key and the Send button can both fire for the same question
+        if self._is_duplicate_submit(user_message):
+            yield history, "Ready to answer more questions."
+            return
 
         # Return status updates to the dedicated status area instead of using progress popup
         status_updates = [
@@ -938,41 +1773,59 @@ class RepoChat:
             "Waiting for response...",
         ]
 
-        # Use the first status update instead of progress popup
-        # progress(0.1, desc=status_updates[0])
-        response = self.query_claude(
-            user_message, progress, status_updates=status_updates
-        )
-
         # Ensure we're using the tuple format that matches the chatbot type
-        history.append((user_message, response))
+        history.append((user_message, ""))
+        yield history, status_updates[1]
+
+        response = ""
+        self._pending_question = user_message.strip()
+        try:
+            for response in self.stream_claude(
+                user_message, progress, status_updates=status_updates
+            ):
+                history[-1] = (user_message, response)
+                yield history, "Streaming response..."
+        finally:
+            self._pending_question = None
 
         # Also update the internal chat history for the API
-        self.chat_history.append((user_message, response))
+        self._record_turn(user_message, response)
 
         # Return ready status after completion
-        return history, "Ready to answer more questions."
+        yield history, "Ready to answer more questions."
+
+    def clear_chat_history(self):
+        """Forget the conversation and everything derived from it"""
+        self.chat_history = deque(maxlen=_MAX_CHAT_TURNS)
+        self._turn_summaries = {}
+        self._history_summary_lines = []
+        self._summarized_turns = 0
+        self._history_tokens = 0
+        self._turn_count = 0
+        self._export_cache = None
 
     def get_full_conversation(self):
         """Return the full conversation history in a copyable format"""
         if not self.chat_history:
             return "No conversation history available."
 
+        # Turns are only ever appended, so the turn count identifies the export
+        if self._export_cache and self._export_cache[0] == self._turn_count:
+            return self._export_cache[1]
+
         conversation = []
         for user_msg, claude_msg in self.chat_history:
             conversation.append(f"User: {user_msg}")
             conversation.append(f"Claude: {claude_msg}")
             conversation.append("---")
 
-        return "\n\n".join(conversation)
+        result = "\n\n".join(conversation)
+        self._export_cache = (self._turn_count, result)
+        return result
 
     def analyze_dependencies(self, progress=gr.Progress()):
         """Analyze code dependencies between files"""
-        if (
-            not self.repo_analysis
-            or not hasattr(self, "file_contents")
-            or not self.file_contents
-        ):
+        if not self.repo_analysis or not self.file_contents:
             return "Please analyze a repository first."
 
         try:
@@ -986,6 +1839,7 @@ class RepoChat:
             # Analyze dependencies
             dependency_data = analyzer.analyze_dependencies(self.file_contents)
             self.dependency_data = dependency_data
+            self._invalidate_system_prompt()
 
             progress(0.7, desc="Generating visualization...")
 
@@ -1001,12 +1855,15 @@ class RepoChat:
             # Generate graph
             try:
                 graph_data = generate_dependency_graph(dependency_data)
-                graph_html = f'<img src="{graph_data}" alt="Dependency Graph" style="max-width:100%;">'
+                if graph_data:
+                    graph_html = f'<img src="{graph_data}" alt="Dependency Graph" style="max-width:100%;">'
+                else:
+                    graph_html = "No dependencies between files to draw."
 
                 # Combine summary and graph
                 result = f"{summary}\n\n### Dependency Graph\n{graph_html}"
             except Exception as e:
-                print(f"Error generating graph: {str(e)}")
+                logger.exception("Error generating graph: %s", e)
                 result = f"{summary}\n\n### Dependency Graph\nError generating graph: {str(e)}"
 
             progress(1.0, desc="Dependency analysis complete!")
@@ -1020,7 +1877,7 @@ class RepoChat:
 def launch_app(share=False):
     repo_chat = RepoChat()
 
-    with gr.Blocks(theme=gr.themes.Soft()) as demo:
+    with gr.Blocks(theme=gr.themes.Soft(), analytics_enabled=False) as demo:
         gr.Markdown("# GitLens - Github Repo Chat Assistant with Code Understanding")
 
         with gr.Row():
@@ -1055,6 +1912,10 @@ def launch_app(share=False):
                     step=10,
                     label="Maximum files to analyze",
                 )
+            with gr.Column(scale=1):
+                force_refresh = gr.Checkbox(
+                    label="Force refresh (ignore cached analysis)", value=False
+                )
 
         # Analysis status indicator
         analysis_status = gr.Markdown(
@@ -1124,25 +1985,6 @@ def launch_app(share=False):
             copy_btn = gr.Button("Copy to Clipboard")
 
         # Set up event handlers
-        def update_status_before_analysis():
-            return "Starting repository analysis... Please wait."
-
-        analyze_button.click(update_status_before_analysis, None, analysis_status).then(
-            repo_chat.analyze_repository_with_progress,
-            inputs=[
-                repo_input,
-                github_token,
-                check_plagiarism,
-                analyze_code,
-                file_limit,
-            ],
-            outputs=[repo_analysis_output, chatbot],
-        ).then(
-            lambda: "Analysis complete! You can now ask questions about the repository.",
-            None,
-            analysis_status,
-        )
-
         # Dependency analysis handler with loading status
         def update_status_before_dependency_analysis():
             return "⏳ Analyzing dependencies... This may take a minute for larger repositories."
@@ -1172,23 +2014,32 @@ def launch_app(share=False):
             [dependency_status, dependency_output]
         )
 
-        # Chat functionality
+        # Chat functionality; both triggers share one limit, so an Enter and a
+        # Send click never run against the shared chat history at once
         msg_submit = submit_btn.click(
-            repo_chat.chat, inputs=[msg, chatbot], outputs=[chatbot, chat_status]
+            repo_chat.chat,
+            inputs=[msg, chatbot],
+            outputs=[chatbot, chat_status],
+            concurrency_limit=_CHAT_CONCURRENCY_LIMIT,
+            concurrency_id="chat",
         ).then(
             lambda: "", None, msg  # Clear the message input after sending
         )
 
         # Also trigger on Enter key
         msg.submit(
-            repo_chat.chat, inputs=[msg, chatbot], outputs=[chatbot, chat_status]
+            repo_chat.chat,
+            inputs=[msg, chatbot],
+            outputs=[chatbot, chat_status],
+            concurrency_limit=_CHAT_CONCURRENCY_LIMIT,
+            concurrency_id="chat",
         ).then(
             lambda: "", None, msg  # Clear the message input after sending
         )
 
         # Clear chat history
         def clear_chat():
-            repo_chat.chat_history = []
+            repo_chat.clear_chat_history()
             return [], "Chat cleared. Ready for new questions."
 
         clear_btn.click(clear_chat, None, [chatbot, chat_status])
@@ -1196,37 +2047,48 @@ def launch_app(share=False):
         # Export conversation
         export_btn.click(repo_chat.get_full_conversation, None, conversation_output)
 
-        # Reset chat history when analyzing a new repo
-        def clear_history():
-            repo_chat.chat_history = []
-            return [], "Repository loaded. Ready for your questions."
-
-        analyze_button.click(clear_history, None, [chatbot, chat_status])
+        # Reset chat history and the file list when analyzing a new repo
+        def start_analysis():
+            repo_chat.clear_chat_history()
+            return (
+                [],
+                "Repository loaded. Ready for your questions.",
+                [],
+                "Starting repository analysis... Please wait.",
+            )
 
         # File explorer functionality
         def update_file_explorer():
-            if (
-                not repo_chat.repo_analysis
-                or not hasattr(repo_chat, "file_contents")
-                or not repo_chat.file_contents
-            ):
+            if not repo_chat.repo_analysis or not repo_chat.file_contents:
                 return [], "No files available. Please analyze a repository first."
 
             file_metadata = repo_chat.repo_analysis.get("file_metadata", {})
-            files_data = []
-
-            for file_path, metadata in file_metadata.items():
-                if not metadata.get(
-                    "skipped", True
-                ):  # Only show files that were actually analyzed
-                    files_data.append(
-                        [
-                            file_path,
-                            metadata.get("type", "unknown"),
-                            f"{metadata.get('size', 0):,} bytes",
-                            metadata.get("last_modified", "unknown"),
-                        ]
-                    )
+            if not file_metadata:
+                return [], "Select a file to view its contents."
+
+            import pandas as pd
+
+            # Build the table column by column instead of row by row
+            metadata = pd.DataFrame.from_dict(file_metadata, orient="index").reindex(
+                columns=["skipped", "type", "size", "last_modified"]
+            )
+            # Only show files that were actually analyzed
+            metadata = metadata[~metadata["skipped"].fillna(True).astype(bool)]
+
+            files_data = pd.DataFrame(
+                {
+                    "File": metadata.index,
+                    "Type": metadata["type"].fillna("unknown").to_numpy(),
+                    "Size": metadata["size"]
+                    .fillna(0)
+                    .astype(int)
+                    .map("{:,} bytes".format)
+                    .to_numpy(),
+                    "Last Modified": metadata["last_modified"]
+                    .fillna("unknown")
+                    .to_numpy(),
+                }
+            )
 
             return files_data, "Select a file to view its contents."
 
@@ -1245,32 +2107,7 @@ def launch_app(share=False):
             # Rest of your function remains the same
             file_ext = os.path.splitext(selected_file_path)[1].lower()
 
-            # Map file extensions to language for syntax highlighting
-            language_map = {
-                ".py": "python",
-                ".js": "javascript",
-                ".jsx": "javascript",
-                ".ts": "typescript",
-                ".tsx": "typescript",
-                ".html": "html",
-                ".css": "css",
-                ".java": "java",
-                ".c": "c",
-                ".cpp": "cpp",
-                ".h": "c",
-                ".cs": "csharp",
-                ".go": "go",
-                ".rb": "ruby",
-                ".php": "php",
-                ".json": "json",
-                ".md": "markdown",
-                ".yml": "yaml",
-                ".yaml": "yaml",
-                ".sh": "bash",
-                ".sql": "sql",
-            }
-
-            language = language_map.get(file_ext, "text")
+            language = _LANGUAGE_MAP.get(file_ext, "text")
 
             # Get file content
             if selected_file_path in repo_chat.file_contents:
@@ -1283,10 +2120,27 @@ def launch_app(share=False):
             else:
                 file_content_display.language = "text"
                 return f"Content not available for {selected_file_path}"
-            # Update file explorer when repository is analyzed
 
-        analyze_button.click(lambda: [], None, file_explorer).then(
+        # Analysis pipeline: reset the chat, analyze, then refresh the file explorer
+        analyze_button.click(
+            start_analysis, None, [chatbot, chat_status, file_explorer, analysis_status]
+        ).then(
+            repo_chat.analyze_repository_with_progress,
+            inputs=[
+                repo_input,
+                github_token,
+                check_plagiarism,
+                analyze_code,
+                file_limit,
+                force_refresh,
+            ],
+            outputs=[repo_analysis_output, chatbot],
+        ).then(
             update_file_explorer, None, [file_explorer, chat_status]
+        ).then(
+            lambda: "Analysis complete! You can now ask questions about the repository.",
+            None,
+            analysis_status,
         )
 
         # View file content when a file is selected
@@ -1304,6 +2158,9 @@ def launch_app(share=False):
         )
 
     # Launch with share=True for a public URL if needed
+    # Events share the RepoChat state, so they still run one at a time;
+    # waiting requests are bounded
+    demo.queue(max_size=64)
     demo.launch(share=share)
 
 
@@ -1,12 +1,402 @@
 # app/plagiarism_detector.py
 import os
 import re
+import base64
 import requests
 import hashlib
 import time
-from difflib import SequenceMatcher
 import io
+import json
+import math
 import random
+import threading
+from urllib.parse import quote
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.utils import get_etag, get_etag_body, put_etag
+
+# File downloads run in parallel, capped to stay clear of GitHub's
+# secondary rate limits
+FETCH_WORKERS = 10
+
+# Results of recent checks, keyed by (extension, content digest) and shared by
+# all detectors in this process, so re-checking a repository skips unchanged files
+CHECK_CACHE_SIZE = 1024
+_check_cache = OrderedDict()
+_check_cache_lock = threading.Lock()
+
+# Only this much of a file is decoded and scanned, and files with a NUL byte
+# near the start are treated as binary and skipped
+MAX_CONTENT_BYTES = 200_000
+BINARY_SNIFF_BYTES = 4096
+
+# Extensions of the files that are checked for plagiarism
+_CODE_EXTENSIONS = frozenset(
+    [
+        ".py",
+        ".js",
+        ".java",
+        ".cpp",
+        ".c",
+        ".cs",
+        ".php",
+        ".rb",
+        ".go",
+        ".swift",
+        ".ts",
+        ".html",
+        ".css",
+    ]
+)
+
+# Files whose path contains any of these are third-party or build output
+_SKIPPED_PATH_PARTS = ("node_modules", "vendor", "dist")
+
+# Signatures that might indicate plagiarism, in order of precedence
+_CODE_SIGNATURES = [
+    {
+        "pattern": r"Copyright \(c\) (?!.*current_year|.*repo_owner).*\d{4}",  # Copyright not matching repo owner
+        "source": "Copyright notice for different author",
+        "confidence": 0.7,
+        "match_type": "Copyright Mismatch",
+    },
+    {
+        "pattern": r"@author\s+(?!.*repo_owner).*",  # Author tag not matching repo owner
+        "source": "Author attribution mismatch",
+        "confidence": 0.6,
+        "match_type": "Author Attribution",
+    },
+    {
+        "pattern": r"DO NOT DISTRIBUTE|confidential|proprietary",  # Restricted code indicators
+        "source": "Potentially proprietary code",
+        "confidence": 0.8,
+        "match_type": "Proprietary Code",
+    },
+]
+
+# Common snippets often copied from specific sources
+# This is a simplified version - a real system would have a larger database
+_COMMON_SNIPPETS = [
+    {
+        "pattern": r"def quicksort\(arr\):\s+if len\(arr\) <= 1:\s+return arr",
+        "source": "Common QuickSort implementation from GeeksforGeeks",
+        "confidence": 0.5,
+        "match_type": "Algorithm Implementation",
+        "extension": ".py",
+    },
+    {
+        "pattern": r"function debounce\(func, wait\)",
+        "source": "Common JavaScript utility from Underscore.js or Lodash",
+        "confidence": 0.6,
+        "match_type": "Utility Function",
+        "extension": ".js",
+    },
+    {
+        "pattern": r"public\s+static\s+void\s+main\(String\[\]\s+args\)",
+        "source": "Standard Java main method - not plagiarism on its own",
+        "confidence": 0.2,
+        "match_type": "Standard Boilerplate",
+        "extension": ".java",
+    },
+]
+
+
+def _fuse_patterns(entries, flags=0):
+    """
+    Combine several patterns into one regex with a named group per pattern
+
+    Each group sits in a lookahead, so the combined regex consumes nothing and
+    a match of one pattern can't hide an overlapping match of another.
+
+    Args:
+        entries (list): Dicts with a "pattern" key
+        flags (int): Regex flags for the combined pattern
+
+    Returns:
+        re.Pattern: Regex whose match.lastgroup is "p<index into entries>"
+    """
+    return re.compile(
+        "|".join(
+            f"(?=(?P<p{i}>{entry['pattern']}))" for i, entry in enumerate(entries)
+        ),
+        flags,
+    )
+
+
+def _first_match(fused_re, content):
+    """
+    Find the match of the highest-precedence pattern in a single scan
+
+    Args:
+        fused_re (re.Pattern): Regex built by _fuse_patterns
+        content (str): Text to scan
+
+    Returns:
+        tuple: (pattern index, (start, end)) of the earliest listed pattern
+            that matches, at its first occurrence, or None if nothing matches
+    """
+    first_matches = {}
+    for match in fused_re.finditer(content):
+        first_matches.setdefault(int(match.lastgroup[1:]), match.span(match.lastgroup))
+        if 0 in first_matches:
+            break
+    if not first_matches:
+        return None
+    index = min(first_matches)
+    return index, first_matches[index]
+
+
+def _match_context(content, span, margin=100):
+    """
+    Cut the text of a match out of the content, with some context on both sides
+
+    Args:
+        content (str): Text the match was found in
+        span (tuple): Start and end of the match
+        margin (int): Characters of context to keep before and after the match
+
+    Returns:
+        str: The matched text with its context
+    """
+    start, end = span
+    return content[max(0, start - margin) : end + margin]
+
+
+@lru_cache(maxsize=4096)
+def _shannon_entropy(text):
+    """
+    Calculate the Shannon entropy of a string in bits per character
+
+    Identifiers repeat a lot within and across files, so results are cached.
+
+    Args:
+        text (str): The string to analyze
+
+    Returns:
+        float: Entropy value
+    """
+    if not text:
+        return 0.0
+    length = len(text)
+    return -sum(
+        count / length * math.log2(count / length)
+        for count in Counter(text).values()
+    )
+
+
+# All signatures are found in a single scan of the file
+_SIGNATURE_RE = _fuse_patterns(_CODE_SIGNATURES, re.IGNORECASE)
+
+# One combined regex per file extension; very common patterns with low
+# confidence are never flagged, so they are left out
+_SNIPPETS_BY_EXT = {}
+for _snippet in _COMMON_SNIPPETS:
+    if _snippet["confidence"] > 0.3:
+        _SNIPPETS_BY_EXT.setdefault(_snippet["extension"], []).append(_snippet)
+_SNIPPETS_BY_EXT = {
+    ext: (_fuse_patterns(snippets), snippets)
+    for ext, snippets in _SNIPPETS_BY_EXT.items()
+}
+
+_COPYRIGHT_RE = re.compile(r"Copyright\s+(?:\(c\)|©)?\s+([^,\n]+)", re.IGNORECASE)
+
+# Comment patterns used to normalize code, one combined pass per language;
+# whichever comment starts first wins
+_PY_COMMENT_RE = re.compile(
+    r"#[^\n]*|\"\"\".*?\"\"\"|'''.*?'''", re.DOTALL
+)
+_C_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_COMMENT_RE_BY_EXT = {
+    ".py": _PY_COMMENT_RE,
+    ".js": _C_COMMENT_RE,
+    ".java": _C_COMMENT_RE,
+    ".c": _C_COMMENT_RE,
+    ".cpp": _C_COMMENT_RE,
+    ".cs": _C_COMMENT_RE,
+}
+
+_NAME_DECLARATION_RE = re.compile(
+    r"\b(var|let|const|function|class|def|int|string|boolean|float|double)\s+([a-zA-Z_][a-zA-Z0-9_]*)\b"
+)
+
+# A name only looks random if its entropy is at least this fraction of the
+# highest possible for its length, and at least two of the signals checked by
+# _is_random_looking_name hold; descriptive camelCase names have high entropy
+# too, so entropy alone can't tell them apart
+OBFUSCATED_NAME_MIN_ENTROPY_RATIO = 0.9
+_IDENTIFIER_ALPHABET_SIZE = 63  # a-z, A-Z, 0-9 and _
+_VOWELS = frozenset("aeiouAEIOU")
+_EMBEDDED_DIGITS_RE = re.compile(r"[A-Za-z]\d+[A-Za-z]")
+
+# Common programming names that are never treated as obfuscated
+_COMMON_NAMES = frozenset(
+    [
+        "index",
+        "count",
+        "value",
+        "result",
+        "temp",
+        "data",
+        "array",
+        "string",
+        "number",
+        "object",
+        "element",
+        "node",
+        "item",
+        "response",
+        "request",
+        "message",
+        "buffer",
+        "stream",
+        "file",
+        "input",
+        "output",
+        "error",
+        "logger",
+        "handler",
+        "helper",
+        "util",
+        "factory",
+        "manager",
+        "service",
+        "provider",
+        "model",
+        "view",
+        "controller",
+        "component",
+        "container",
+        "wrapper",
+    ]
+)
+
+# Code fingerprints hash every FINGERPRINT_K character substring of the
+# normalized code with a rolling hash and keep the smallest hash of each
+# window of FINGERPRINT_WINDOW substrings (winnowing)
+FINGERPRINT_K = 10
+FINGERPRINT_WINDOW = 20
+_HASH_MOD = (1 << 61) - 1
+_HASH_BASE = 257
+
+# Share of a reference's fingerprints that must appear in a file to flag it
+FINGERPRINT_MATCH_THRESHOLD = 0.6
+
+
+def _normalize_source(content, ext):
+    """
+    Remove comments and collapse whitespace so formatting changes don't matter
+
+    Args:
+        content (str): Source code
+        ext (str): Lowercase file extension, including the dot
+
+    Returns:
+        str: Normalized code
+    """
+    comment_re = _COMMENT_RE_BY_EXT.get(ext)
+    if comment_re:
+        content = comment_re.sub("", content)
+    return " ".join(content.split())
+
+
+def _fingerprint(text):
+    """
+    Compute the winnowed Rabin-Karp fingerprint of a text
+
+    Any substring shared by two texts that is at least
+    FINGERPRINT_K + FINGERPRINT_WINDOW - 1 characters long yields at least one
+    shared fingerprint hash.
+
+    Args:
+        text (str): Normalized code
+
+    Returns:
+        frozenset: Selected k-gram hashes
+    """
+    if len(text) < FINGERPRINT_K:
+        return frozenset()
+
+    # Rolling hash of every k-gram
+    high = pow(_HASH_BASE, FINGERPRINT_K - 1, _HASH_MOD)
+    h = 0
+    for char in text[:FINGERPRINT_K]:
+        h = (h * _HASH_BASE + ord(char)) % _HASH_MOD
+    hashes = [h]
+    for i in range(FINGERPRINT_K, len(text)):
+        h = (
+            (h - ord(text[i - FINGERPRINT_K]) * high) * _HASH_BASE + ord(text[i])
+        ) % _HASH_MOD
+        hashes.append(h)
+
+    if len(hashes) <= FINGERPRINT_WINDOW:
+        return frozenset((min(hashes),))
+
+    # Keep the minimum of each window, tracked with a monotonic queue of indexes
+    selected = set()
+    window = deque()
+    for i, h in enumerate(hashes):
+        while window and hashes[window[-1]] >= h:
+            window.pop()
+        window.append(i)
+        if window[0] <= i - FINGERPRINT_WINDOW:
+            window.popleft()
+        if i >= FINGERPRINT_WINDOW - 1:
+            selected.add(hashes[window[0]])
+    return frozenset(selected)
+
+
+# Well-known code that is often copied verbatim or lightly edited; a real
+# system would fingerprint a large corpus of known code instead
+_REFERENCE_CODE = [
+    {
+        "code": (
+            "def quicksort(arr):\n"
+            "    if len(arr) <= 1:\n"
+            "        return arr\n"
+            "    pivot = arr[len(arr) // 2]\n"
+            "    left = [x for x in arr if x < pivot]\n"
+            "    middle = [x for x in arr if x == pivot]\n"
+            "    right = [x for x in arr if x > pivot]\n"
+            "    return quicksort(left) + middle + quicksort(right)\n"
+        ),
+        "source": "Common QuickSort implementation from GeeksforGeeks",
+        "confidence": 0.5,
+        "match_type": "Similar Code",
+        "extension": ".py",
+    },
+    {
+        "code": (
+            "function debounce(func, wait) {\n"
+            "  var timeout;\n"
+            "  return function() {\n"
+            "    var context = this, args = arguments;\n"
+            "    clearTimeout(timeout);\n"
+            "    timeout = setTimeout(function() {\n"
+            "      func.apply(context, args);\n"
+            "    }, wait);\n"
+            "  };\n"
+            "}\n"
+        ),
+        "source": "Common JavaScript utility from Underscore.js or Lodash",
+        "confidence": 0.6,
+        "match_type": "Similar Code",
+        "extension": ".js",
+    },
+]
+
+# Reference fingerprints, computed once and grouped by file extension
+_REFERENCE_FINGERPRINTS = {}
+for _reference in _REFERENCE_CODE:
+    _REFERENCE_FINGERPRINTS.setdefault(_reference["extension"], []).append(
+        (
+            _reference,
+            _fingerprint(_normalize_source(_reference["code"], _reference["extension"])),
+        )
+    )
 
 
 class PlagiarismDetector:
@@ -23,13 +413,41 @@ class PlagiarismDetector:
         if github_token:
             self.headers["Authorization"] = f"token {github_token}"
 
-    def detect_plagiarism(self, repo_url, max_files=10):
+        # Keep-alive connections shared by all downloads, with retries for
+        # transient GitHub errors
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=FETCH_WORKERS,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 502, 503, 504),
+                respect_retry_after_header=True,
+            ),
+        )
+        self._session.mount("https://", adapter)
+
+    def close(self):
+        """Close the pooled connections of the detector"""
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def detect_plagiarism(self, repo_url, max_files=10, progress_cb=None):
         """
         Detect potential plagiarism in a GitHub repository
 
         Args:
             repo_url (str): URL of the GitHub repository to check
             max_files (int): Maximum number of files to check (to avoid rate limits)
+            progress_cb (callable, optional): Called as progress_cb(fraction, description)
+                before each file is checked
 
         Returns:
             dict: Results of plagiarism detection with potentially plagiarized files and their sources
@@ -60,17 +478,18 @@ class PlagiarismDetector:
             results["summary"] = "No code files found to check for plagiarism."
             return results
 
-        # Check each file for potential plagiarism
-        for file_info in code_files:
-            file_path = file_info["path"]
-            file_content = self._get_file_content(file_info["download_url"])
-
-            if not file_content:
-                continue
+        # Download all files at once, then check them in their original order
+        file_contents = self._fetch_all(code_files, progress_cb)
 
-            # Check this file for plagiarism using different methods
-            plagiarism_check = self._check_file_plagiarism(file_path, file_content)
+        # Check each file for potential plagiarism
+        items = [
+            (file_info["path"], file_content)
+            for file_info, file_content in zip(code_files, file_contents)
+            if file_content
+        ]
+        checks = self._check_files(items)
 
+        for (file_path, _), plagiarism_check in zip(items, checks):
             if plagiarism_check["is_suspicious"]:
                 results["plagiarism_detected"] = True
                 results["suspicious_files"].append(
@@ -95,6 +514,101 @@ class PlagiarismDetector:
 
         return results
 
+    def _check_files(self, items):
+        """
+        Check several files for plagiarism, checking identical files only once
+
+        Args:
+            items (list): (file path, content) pairs
+
+        Returns:
+            list: Results of _check_file_plagiarism, in the order of items
+        """
+        # Repositories often hold several copies of the same file (vendored
+        # code, license headers); the checks only depend on the content and
+        # the extension
+        keys = [
+            (
+                os.path.splitext(file_path)[1].lower(),
+                hashlib.blake2b(content.encode(), digest_size=16).digest(),
+            )
+            for file_path, content in items
+        ]
+
+        checks = {}
+        pending_items = {}
+        with _check_cache_lock:
+            for key, item in zip(keys, items):
+                if key in checks or key in pending_items:
+                    continue
+                if key in _check_cache:
+                    _check_cache.move_to_end(key)
+                    checks[key] = _check_cache[key]
+                else:
+                    pending_items[key] = item
+
+        new_checks = self._run_checks(list(pending_items.values()))
+
+        with _check_cache_lock:
+            for key, check in zip(pending_items, new_checks):
+                checks[key] = check
+                _check_cache[key] = check
+            while len(_check_cache) > CHECK_CACHE_SIZE:
+                _check_cache.popitem(last=False)
+
+        return [checks[key] for key in keys]
+
+    def _run_checks(self, items):
+        """
+        Check several files for plagiarism
+
+        Args:
+            items (list): (file path, content) pairs
+
+        Returns:
+            list: Results of _check_file_plagiarism, in the order of items
+        """
+        # At most max_files files are checked per repository, far too few to
+        # repay starting worker processes, so the checks run in this process
+        return [
+            self._check_file_plagiarism(file_path, content)
+            for file_path, content in items
+        ]
+
+    def _fetch_all(self, code_files, progress_cb=None):
+        """
+        Download the content of several files concurrently
+
+        Args:
+            code_files (list): File information from _get_code_files
+            progress_cb (callable, optional): Called as progress_cb(fraction, description)
+                after each file is downloaded
+
+        Returns:
+            list: File contents (None for failed downloads), in the order of code_files
+        """
+        contents = [None] * len(code_files)
+        with ThreadPoolExecutor(
+            max_workers=min(FETCH_WORKERS, len(code_files))
+        ) as executor:
+            futures = {
+                executor.submit(
+                    self._get_file_content,
+                    file_info["download_url"],
+                    file_info.get("api_url"),
+                ): index
+                for index, file_info in enumerate(code_files)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                contents[index] = future.result()
+                if progress_cb:
+                    progress_cb(
+                        done / len(code_files),
+                        f"Checking {code_files[index]['path']}...",
+                    )
+        return contents
+
     def _get_code_files(self, base_api_url, max_files):
         """
         Get a list of code files from the repository
@@ -107,39 +621,33 @@ class PlagiarismDetector:
             list: List of code file information
         """
         code_files = []
-        extensions = [
-            ".py",
-            ".js",
-            ".java",
-            ".cpp",
-            ".c",
-            ".cs",
-            ".php",
-            ".rb",
-            ".go",
-            ".swift",
-            ".ts",
-            ".html",
-            ".css",
-        ]
 
         try:
             # Get repository contents
-            response = requests.get(
-                f"{base_api_url}/git/trees/main?recursive=1", headers=self.headers
+            branch = "main"
+            status_code, body = self._cached_get(
+                f"{base_api_url}/git/trees/{branch}?recursive=1"
             )
 
             # If main branch doesn't exist, try master
-            if response.status_code != 200:
-                response = requests.get(
-                    f"{base_api_url}/git/trees/master?recursive=1", headers=self.headers
+            if status_code != 200:
+                branch = "master"
+                status_code, body = self._cached_get(
+                    f"{base_api_url}/git/trees/{branch}?recursive=1"
                 )
 
-            if response.status_code != 200:
-                print(f"Error getting repository file tree: {response.status_code}")
+            if status_code != 200:
+                print(f"Error getting repository file tree: {status_code}")
                 return code_files
 
-            tree = response.json().get("tree", [])
+            tree = json.loads(body).get("tree", [])
+
+            # Files are downloaded from the raw host, which serves the bytes
+            # directly and doesn't count against the REST API rate limit
+            raw_base_url = (
+                base_api_url.replace("api.github.com/repos", "raw.githubusercontent.com")
+                + f"/{branch}"
+            )
 
             # Filter for code files with specific extensions
             for item in tree:
@@ -148,45 +656,55 @@ class PlagiarismDetector:
                     file_ext = os.path.splitext(file_path)[1].lower()
 
                     # Check if it's a code file
-                    if file_ext in extensions:
+                    if file_ext in _CODE_EXTENSIONS:
                         # Skip large files, minified files, and node_modules
                         if (
                             item.get("size", 0) < 100000
                             and "min." not in file_path.lower()
-                            and "node_modules" not in file_path
-                            and "vendor" not in file_path
-                            and "dist" not in file_path
+                            and not any(
+                                part in file_path for part in _SKIPPED_PATH_PARTS
+                            )
                         ):
 
                             code_files.append(
                                 {
                                     "path": file_path,
-                                    "download_url": f"{base_api_url}/contents/{file_path}",
+                                    "download_url": f"{raw_base_url}/{quote(file_path)}",
+                                    "api_url": f"{base_api_url}/contents/{quote(file_path)}?ref={branch}",
                                     "size": item.get("size", 0),
                                 }
                             )
 
             # Trim to max_files but try to get a diverse sample
             if len(code_files) > max_files:
-                # Sort by different extensions for diversity
-                code_files.sort(key=lambda x: os.path.splitext(x["path"])[1])
+                # Sort by different extensions for diversity, splitting each path once
+                by_ext = sorted(
+                    ((os.path.splitext(f["path"])[1], f) for f in code_files),
+                    key=lambda item: item[0],
+                )
+                code_files = [f for _, f in by_ext]
                 # Take a sampling that prioritizes diversity of file types
                 selected_files = []
-                ext_counts = {}
+                selected_indexes = set()
+                seen_exts = set()
 
                 # First pass - get one of each extension
-                for file in code_files:
-                    ext = os.path.splitext(file["path"])[1]
-                    if ext not in ext_counts:
-                        ext_counts[ext] = 1
+                for index, (ext, file) in enumerate(by_ext):
+                    if ext not in seen_exts:
+                        seen_exts.add(ext)
                         selected_files.append(file)
+                        selected_indexes.add(index)
                         if len(selected_files) >= max_files:
                             break
 
                 # Second pass - fill remaining slots randomly
                 remaining = max_files - len(selected_files)
                 if remaining > 0:
-                    remaining_files = [f for f in code_files if f not in selected_files]
+                    remaining_files = [
+                        f
+                        for index, f in enumerate(code_files)
+                        if index not in selected_indexes
+                    ]
                     selected_files.extend(
                         random.sample(
                             remaining_files, min(remaining, len(remaining_files))
@@ -201,40 +719,46 @@ class PlagiarismDetector:
             print(f"Error retrieving code files: {str(e)}")
             return []
 
-    def _get_file_content(self, download_url):
+    def _get_file_content(self, download_url, api_url=None):
         """
         Get the content of a file from its download URL
 
         Args:
-            download_url (str): URL to download the file
+            download_url (str): URL to download the raw file
+            api_url (str, optional): Contents API URL of the file, used if the
+                raw download fails
 
         Returns:
-            str: Content of the file
+            str: Content of the file (at most MAX_CONTENT_BYTES of it), or None
+                for binary files and failed downloads
         """
         try:
-            response = requests.get(download_url, headers=self.headers)
-
-            if response.status_code == 200:
-                content_data = response.json()
-                if (
-                    "content" in content_data
-                    and content_data.get("encoding") == "base64"
-                ):
-                    import base64
-
-                    content = base64.b64decode(content_data["content"]).decode(
-                        "utf-8", errors="replace"
-                    )
-                    return content
-
-            # Try direct download if the above method fails
-            raw_url = download_url.replace(
-                "api.github.com/repos", "raw.githubusercontent.com"
-            ).replace("/contents/", "/")
-            response = requests.get(raw_url, headers=self.headers)
+            status_code, data = self._cached_get(
+                download_url, max_bytes=MAX_CONTENT_BYTES
+            )
 
-            if response.status_code == 200:
-                return response.text
+            # Binary files are skipped before anything is decoded
+            if status_code == 200:
+                if b"\x00" in data[:BINARY_SNIFF_BYTES]:
+                    return None
+                return data.decode("utf-8", errors="replace")
+
+            # Fall back to the contents API if the direct download fails
+            if api_url:
+                status_code, body = self._cached_get(api_url)
+
+                if status_code == 200:
+                    content_data = json.loads(body)
+                    if (
+                        "content" in content_data
+                        and content_data.get("encoding") == "base64"
+                    ):
+                        data = base64.b64decode(content_data["content"])
+                        if b"\x00" in data[:BINARY_SNIFF_BYTES]:
+                            return None
+                        return data[:MAX_CONTENT_BYTES].decode(
+                            "utf-8", errors="replace"
+                        )
 
             return None
 
@@ -242,6 +766,42 @@ class PlagiarismDetector:
             print(f"Error getting file content: {str(e)}")
             return None
 
+    def _cached_get(self, url, max_bytes=None):
+        """
+        GET a URL, revalidating a previously cached response with its ETag
+
+        Args:
+            url (str): URL to request
+            max_bytes (int, optional): Keep (and cache) only this many bytes of
+                the body
+
+        Returns:
+            tuple: (status code, response body as bytes); a 304 Not Modified is
+                returned as 200 with the cached body
+        """
+        headers = None
+        etag = get_etag(url)
+        if etag:
+            headers = {"If-None-Match": etag}
+
+        response = self._session.get(url, headers=headers)
+
+        if response.status_code == 304:
+            body = get_etag_body(url)
+            if body is not None:
+                return 200, body
+            response = self._session.get(url)
+
+        # The body is kept as bytes; callers decide how much of it to decode
+        body = response.content
+        if max_bytes is not None:
+            body = body[:max_bytes]
+
+        if response.status_code == 200 and response.headers.get("ETag"):
+            put_etag(url, response.headers["ETag"], body)
+
+        return response.status_code, body
+
     def _check_file_plagiarism(self, file_path, content):
         """
         Check a file for potential plagiarism using multiple methods
@@ -265,6 +825,8 @@ class PlagiarismDetector:
         if len(content) < 100:
             return result
 
+        file_ext = os.path.splitext(file_path)[1].lower()
+
         # 1. Check for specific code fingerprints/signatures
         signature_check = self._check_code_signatures(content)
         if signature_check["is_suspicious"]:
@@ -276,13 +838,13 @@ class PlagiarismDetector:
             return copyright_check
 
         # 3. Check for code snippets that are commonly copied from specific sources
-        snippet_check = self._check_common_snippets(file_path, content)
+        snippet_check = self._check_common_snippets(file_ext, content)
         if snippet_check["is_suspicious"]:
             return snippet_check
 
         # 4. Apply fuzzy matching to check for slightly modified code
         # This is a simplified demo - in a real system, you'd compare against a database
-        fuzzy_check = self._apply_fuzzy_matching(file_path, content)
+        fuzzy_check = self._apply_fuzzy_matching(file_ext, content)
         if fuzzy_check["is_suspicious"]:
             return fuzzy_check
 
@@ -306,42 +868,19 @@ class PlagiarismDetector:
             "snippet": "",
         }
 
-        # List of signatures that might indicate plagiarism
-        signatures = [
-            {
-                "pattern": r"Copyright \(c\) (?!.*current_year|.*repo_owner).*\d{4}",  # Copyright not matching repo owner
-                "source": "Copyright notice for different author",
-                "confidence": 0.7,
-                "match_type": "Copyright Mismatch",
-            },
-            {
-                "pattern": r"@author\s+(?!.*repo_owner).*",  # Author tag not matching repo owner
-                "source": "Author attribution mismatch",
-                "confidence": 0.6,
-                "match_type": "Author Attribution",
-            },
-            {
-                "pattern": r"DO NOT DISTRIBUTE|confidential|proprietary",  # Restricted code indicators
-                "source": "Potentially proprietary code",
-                "confidence": 0.8,
-                "match_type": "Proprietary Code",
-            },
-        ]
-
-        for signature in signatures:
-            matches = re.finditer(signature["pattern"], content, re.IGNORECASE)
-            for match in matches:
-                snippet = content[
-                    max(0, match.start() - 100) : min(len(content), match.end() + 100)
-                ]
-                result = {
-                    "is_suspicious": True,
-                    "confidence": signature["confidence"],
-                    "potential_source": signature["source"],
-                    "match_type": signature["match_type"],
-                    "snippet": snippet,
-                }
-                return result
+        # Scan once for all signatures; the first one listed wins
+        first_match = _first_match(_SIGNATURE_RE, content)
+        if first_match:
+            index, span = first_match
+            signature = _CODE_SIGNATURES[index]
+            snippet = _match_context(content, span)
+            result = {
+                "is_suspicious": True,
+                "confidence": signature["confidence"],
+                "potential_source": signature["source"],
+                "match_type": signature["match_type"],
+                "snippet": snippet,
+            }
 
         return result
 
@@ -364,8 +903,7 @@ class PlagiarismDetector:
         }
 
         # Check for multiple different copyright notices in the same file
-        copyright_pattern = r"Copyright\s+(?:\(c\)|©)?\s+([^,\n]+)"
-        matches = re.finditer(copyright_pattern, content, re.IGNORECASE)
+        matches = _COPYRIGHT_RE.finditer(content)
 
         copyright_holders = set()
         for match in matches:
@@ -386,12 +924,12 @@ class PlagiarismDetector:
 
         return result
 
-    def _check_common_snippets(self, file_path, content):
+    def _check_common_snippets(self, file_ext, content):
         """
         Check for code snippets that are commonly copied
 
         Args:
-            file_path (str): Path of the file
+            file_ext (str): Lowercase extension of the file, including the dot
             content (str): Content of the file
 
         Returns:
@@ -405,66 +943,35 @@ class PlagiarismDetector:
             "snippet": "",
         }
 
-        # Common snippets often copied from specific sources
-        # This is a simplified version - a real system would have a larger database
-        common_snippets = [
-            {
-                "pattern": r"def quicksort\(arr\):\s+if len\(arr\) <= 1:\s+return arr",
-                "source": "Common QuickSort implementation from GeeksforGeeks",
-                "confidence": 0.5,
-                "match_type": "Algorithm Implementation",
-                "extension": ".py",
-            },
-            {
-                "pattern": r"function debounce\(func, wait\)",
-                "source": "Common JavaScript utility from Underscore.js or Lodash",
-                "confidence": 0.6,
-                "match_type": "Utility Function",
-                "extension": ".js",
-            },
-            {
-                "pattern": r"public\s+static\s+void\s+main\(String\[\]\s+args\)",
-                "source": "Standard Java main method - not plagiarism on its own",
-                "confidence": 0.2,
-                "match_type": "Standard Boilerplate",
-                "extension": ".java",
-            },
-        ]
+        if file_ext not in _SNIPPETS_BY_EXT:
+            return result
+        snippet_re, snippets = _SNIPPETS_BY_EXT[file_ext]
 
-        file_ext = os.path.splitext(file_path)[1].lower()
+        # Scan once for all snippets of this language; the first one listed wins
+        first_match = _first_match(snippet_re, content)
+        if first_match:
+            index, span = first_match
+            snippet = snippets[index]
 
-        for snippet in common_snippets:
-            if snippet.get("extension") and snippet["extension"] != file_ext:
-                continue
+            # Find the matched text with some context
+            context = _match_context(content, span)
 
-            if re.search(snippet["pattern"], content):
-                # If it's a very common pattern with low confidence, don't flag it
-                if snippet["confidence"] <= 0.3:
-                    continue
-
-                # Find the matched text with some context
-                match = re.search(snippet["pattern"], content)
-                context = content[
-                    max(0, match.start() - 100) : min(len(content), match.end() + 100)
-                ]
-
-                result = {
-                    "is_suspicious": True,
-                    "confidence": snippet["confidence"],
-                    "potential_source": snippet["source"],
-                    "match_type": snippet["match_type"],
-                    "snippet": context,
-                }
-                return result
+            result = {
+                "is_suspicious": True,
+                "confidence": snippet["confidence"],
+                "potential_source": snippet["source"],
+                "match_type": snippet["match_type"],
+                "snippet": context,
+            }
 
         return result
 
-    def _apply_fuzzy_matching(self, file_path, content):
+    def _apply_fuzzy_matching(self, file_ext, content):
         """
         Apply fuzzy matching to check for slightly modified code
 
         Args:
-            file_path (str): Path of the file
+            file_ext (str): Lowercase extension of the file, including the dot
             content (str): Content of the file
 
         Returns:
@@ -482,7 +989,7 @@ class PlagiarismDetector:
         # For this demo, we'll check against some very common code patterns
 
         # Normalize the content to make comparison more effective
-        normalized_content = self._normalize_code(content, file_path)
+        normalized_content = self._normalize_code(content, file_ext)
 
         # Check for abnormally high entropy in variable names (potential obfuscation)
         if self._check_obfuscation(normalized_content):
@@ -495,37 +1002,40 @@ class PlagiarismDetector:
             }
             return result
 
+        # Compare the fingerprint of the file with those of known code
+        references = _REFERENCE_FINGERPRINTS.get(file_ext)
+        if references:
+            fingerprint = _fingerprint(normalized_content)
+            for reference, reference_fingerprint in references:
+                # Share of the known code found in the file, so that a copied
+                # snippet counts even when the rest of the file is original
+                similarity = len(reference_fingerprint & fingerprint) / len(
+                    reference_fingerprint
+                )
+                if similarity >= FINGERPRINT_MATCH_THRESHOLD:
+                    result = {
+                        "is_suspicious": True,
+                        "confidence": reference["confidence"],
+                        "potential_source": reference["source"],
+                        "match_type": reference["match_type"],
+                        "snippet": f"{int(similarity * 100)}% of the fingerprint of this known code appears in the file.",
+                    }
+                    return result
+
         return result
 
-    def _normalize_code(self, content, file_path):
+    def _normalize_code(self, content, file_ext):
         """
         Normalize code for better comparison (remove comments, whitespace, etc.)
 
         Args:
             content (str): Content of the file
-            file_path (str): Path of the file
+            file_ext (str): Lowercase extension of the file, including the dot
 
         Returns:
             str: Normalized code
         """
-        # Get file extension
-        ext = os.path.splitext(file_path)[1].lower()
-
-        # Remove comments based on language
-        if ext in [".py"]:
-            # Remove Python comments
-            content = re.sub(r"#.*$", "", content, flags=re.MULTILINE)
-            content = re.sub(r'""".*?"""', "", content, flags=re.DOTALL)
-            content = re.sub(r"'''.*?'''", "", content, flags=re.DOTALL)
-        elif ext in [".js", ".java", ".c", ".cpp", ".cs"]:
-            # Remove C-style comments
-            content = re.sub(r"//.*$", "", content, flags=re.MULTILINE)
-            content = re.sub(r"/\*.*?\*/", "", content, flags=re.DOTALL)
-
-        # Remove whitespace
-        content = re.sub(r"\s+", " ", content)
-
-        return content
+        return _normalize_source(content, file_ext)
 
     def _check_obfuscation(self, content):
         """
@@ -538,8 +1048,7 @@ class PlagiarismDetector:
             bool: True if obfuscation is suspected, False otherwise
         """
         # Extract variable and function names
-        var_pattern = r"\b(var|let|const|function|class|def|int|string|boolean|float|double)\s+([a-zA-Z_][a-zA-Z0-9_]*)\b"
-        names = re.findall(var_pattern, content)
+        names = _NAME_DECLARATION_RE.findall(content)
 
         if not names:
             return False
@@ -547,22 +1056,67 @@ class PlagiarismDetector:
         # Extract just the names without the type
         names = [name[1] for name in names]
 
-        # Check for random-looking names (high entropy)
+        # If more than 30% of names look random, flag as suspicious; stop as
+        # soon as the remaining names can no longer change the outcome
+        threshold = 0.3 * len(names)
         random_looking_names = 0
-        for name in names:
+        for index, name in enumerate(names):
+            if random_looking_names > threshold:
+                return True
+            if random_looking_names + len(names) - index <= threshold:
+                return False
+
             # Skip very short names
             if len(name) < 4:
                 continue
 
-            # Calculate entropy of the name
-            entropy = self._calculate_entropy(name)
-
-            # High entropy names might indicate obfuscation
-            if entropy > 3.5 and not self._is_common_name(name):
+            if self._is_random_looking_name(name) and not self._is_common_name(name):
                 random_looking_names += 1
 
-        # If more than 30% of names look random, flag as suspicious
-        return random_looking_names > 0 and (random_looking_names / len(names)) > 0.3
+        return random_looking_names > threshold
+
+    def _is_random_looking_name(self, name):
+        """
+        Check if a name looks generated rather than written by a person
+
+        Args:
+            name (str): The name to check
+
+        Returns:
+            bool: True if the name looks random
+        """
+        # Names from obfuscators such as javascript-obfuscator
+        if name.startswith("_0x"):
+            return True
+
+        letters = [char for char in name if char.isalpha()]
+        if len(letters) < 4:
+            return False
+
+        # Compare with the highest entropy a name of this length can have
+        max_entropy = math.log2(min(len(name), _IDENTIFIER_ALPHABET_SIZE))
+        if self._calculate_entropy(name) < OBFUSCATED_NAME_MIN_ENTROPY_RATIO * max_entropy:
+            return False
+
+        # Words have vowels; random strings have few or none
+        vowel_ratio = sum(char in _VOWELS for char in letters) / len(letters)
+        if vowel_ratio == 0 and len(letters) >= 5:
+            signals = 2
+        else:
+            signals = int(vowel_ratio < 0.2)
+
+        # Digits mixed in between letters, e.g. "qZ0xK8"
+        if sum(char.isdigit() for char in name) >= 2 and _EMBEDDED_DIGITS_RE.search(name):
+            signals += 1
+
+        # Case changing at most letters; camelCase only changes at word starts
+        case_changes = sum(
+            a.islower() != b.islower() for a, b in zip(letters, letters[1:])
+        )
+        if case_changes >= 0.6 * (len(letters) - 1):
+            signals += 1
+
+        return signals >= 2
 
     def _calculate_entropy(self, text):
         """
@@ -574,20 +1128,7 @@ class PlagiarismDetector:
         Returns:
             float: Entropy value
         """
-        # Count each character
-        counts = {}
-        for char in text:
-            counts[char] = counts.get(char, 0) + 1
-
-        # Calculate entropy
-        length = len(text)
-        entropy = 0
-
-        for count in counts.values():
-            probability = count / length
-            entropy -= probability * (1 / probability)
-
-        return entropy
+        return _shannon_entropy(text)
 
     def _is_common_name(self, name):
         """
@@ -599,43 +1140,4 @@ class PlagiarismDetector:
         Returns:
             bool: True if it's a common name, False otherwise
         """
-        common_names = [
-            "index",
-            "count",
-            "value",
-            "result",
-            "temp",
-            "data",
-            "array",
-            "string",
-            "number",
-            "object",
-            "element",
-            "node",
-            "item",
-            "response",
-            "request",
-            "message",
-            "buffer",
-            "stream",
-            "file",
-            "input",
-            "output",
-            "error",
-            "logger",
-            "handler",
-            "helper",
-            "util",
-            "factory",
-            "manager",
-            "service",
-            "provider",
-            "model",
-            "view",
-            "controller",
-            "component",
-            "container",
-            "wrapper",
-        ]
-
-        return name.lower() in common_names
+        return name.lower() in _COMMON_NAMES
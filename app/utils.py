@@ -2,6 +2,10 @@ import os
 import json
 import hashlib
 import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
 from typing import Dict, Any, Optional, Union
 
@@ -12,8 +16,12 @@ cache_stats = {
     "saved_requests": 0
 }
 
+# Cache writes run here, in order, so callers don't wait on the disk
+_CACHE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gitlens-cache")
+
+@lru_cache(maxsize=1)
 def load_env():
-    """Load environment variables from .env file if present"""
+    """Load environment variables from .env file if present (read once per process)"""
     # Try to load from .env file
     load_dotenv()
     
@@ -26,11 +34,63 @@ def get_cache_dir() -> str:
     os.makedirs(cache_dir, exist_ok=True)
     return cache_dir
 
+def _cache_key(text: str) -> str:
+    """Hash a URL or path into a short cache file name (not used for security)"""
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+def _legacy_cache_key(text: str) -> str:
+    """Hash used for cache file names before _cache_key, still read as a fallback"""
+    return hashlib.md5(text.encode()).hexdigest()
+
+def _existing_cache_path(path: str, legacy_path: str) -> str:
+    """Return the legacy cache path if only an entry written under it exists"""
+    if not os.path.exists(path) and os.path.exists(legacy_path):
+        return legacy_path
+    return path
+
 def get_cache_file_path(repo_url: str) -> str:
     """Generate a unique cache file path for a repository URL"""
     # Create a hash of the repo URL to use as filename
-    url_hash = hashlib.md5(repo_url.encode()).hexdigest()
-    return os.path.join(get_cache_dir(), f"{url_hash}.json")
+    return os.path.join(get_cache_dir(), f"{_cache_key(repo_url)}.json")
+
+def _get_file_cache_path(file_path: str, key=_cache_key) -> str:
+    """Get the cache path of an individual file's content"""
+    return os.path.join(get_cache_dir(), "files", f"{key(file_path)}.txt")
+
+def _atomic_write(path: str, text: Union[str, bytes]) -> None:
+    """
+    Write a file through a temporary file and a rename, so readers never see partial content
+
+    Line endings are written as given, without translation.
+    
+    Args:
+        path: The file to write
+        text: The content to write, as text or as raw bytes
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        if isinstance(text, bytes):
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', encoding='utf-8', newline='')
+        with f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _write_cache_file(path: str, text: Union[str, bytes], description: str) -> None:
+    """Write a cache file in the background, warning instead of raising on failure"""
+    def write():
+        try:
+            _atomic_write(path, text)
+        except Exception as e:
+            print(f"Warning: Failed to cache {description}: {str(e)}")
+    _CACHE_EXECUTOR.submit(write)
 
 def cache_repository_data(repo_url: str, data: Dict[str, Any]) -> None:
     """
@@ -55,10 +115,12 @@ def cache_repository_data(repo_url: str, data: Dict[str, Any]) -> None:
     }
     
     try:
-        with open(cache_path, 'w') as f:
-            json.dump(cache_data, f)
+        # Serialized now so later changes to data don't leak into the cache
+        text = json.dumps(cache_data, separators=(",", ":"))
     except Exception as e:
         print(f"Warning: Failed to cache repository data: {str(e)}")
+        return
+    _write_cache_file(cache_path, text, "repository data")
 
 def get_cached_repository_data(repo_url: str) -> Optional[Dict[str, Any]]:
     """
@@ -70,7 +132,10 @@ def get_cached_repository_data(repo_url: str) -> Optional[Dict[str, Any]]:
     Returns:
         The cached data or None if not available/expired
     """
-    cache_path = get_cache_file_path(repo_url)
+    cache_path = _existing_cache_path(
+        get_cache_file_path(repo_url),
+        os.path.join(get_cache_dir(), f"{_legacy_cache_key(repo_url)}.json"),
+    )
     
     # Check if cache file exists
     if not os.path.exists(cache_path):
@@ -105,17 +170,10 @@ def cache_file_content(file_path: str, content: str) -> None:
         content: The file content to cache
     """
     # Create a hash of the file path to use as filename
-    path_hash = hashlib.md5(file_path.encode()).hexdigest()
-    cache_dir = os.path.join(get_cache_dir(), "files")
-    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = _get_file_cache_path(file_path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
     
-    cache_path = os.path.join(cache_dir, f"{path_hash}.txt")
-    
-    try:
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-    except Exception as e:
-        print(f"Warning: Failed to cache file content for {file_path}: {str(e)}")
+    _write_cache_file(cache_path, content, f"file content for {file_path}")
 
 def get_cached_file_content(file_path: str) -> Optional[str]:
     """
@@ -128,9 +186,10 @@ def get_cached_file_content(file_path: str) -> Optional[str]:
         The cached file content or None if not available
     """
     # Create a hash of the file path to use as filename
-    path_hash = hashlib.md5(file_path.encode()).hexdigest()
-    cache_dir = os.path.join(get_cache_dir(), "files")
-    cache_path = os.path.join(cache_dir, f"{path_hash}.txt")
+    cache_path = _existing_cache_path(
+        _get_file_cache_path(file_path),
+        _get_file_cache_path(file_path, key=_legacy_cache_key),
+    )
     
     # Check if cache file exists
     if not os.path.exists(cache_path):
@@ -145,6 +204,107 @@ def get_cached_file_content(file_path: str) -> Optional[str]:
         print(f"Warning: Failed to load cached file content for {file_path}: {str(e)}")
         return None
 
+# Responses of conditional GitHub requests are cached one file per URL, with
+# the ETag on the first line and the body after it, and are bounded in age and count
+ETAG_MAX_AGE = 7 * 24 * 60 * 60  # 7 days in seconds
+ETAG_MAX_ENTRIES = 5000
+# The oldest entries beyond ETAG_MAX_ENTRIES are pruned once per this many writes
+_ETAG_PRUNE_INTERVAL = 100
+_etag_writes = 0
+_etag_writes_lock = threading.Lock()
+
+def _get_etag_body_path(url: str) -> str:
+    """Get the path of the cached response (ETag and body) for a URL"""
+    return os.path.join(get_cache_dir(), "blobs", _cache_key(url))
+
+def _read_etag_entry(url: str, with_body: bool) -> Optional[tuple]:
+    """Read the cached (ETag, body) of a URL, or None if it is missing or expired"""
+    path = _get_etag_body_path(url)
+    try:
+        if time.time() - os.path.getmtime(path) > ETAG_MAX_AGE:
+            return None
+        # The body is stored as the raw bytes of the response
+        with open(path, 'rb') as f:
+            etag = f.readline().rstrip(b"\n").decode('utf-8', errors='replace')
+            body = f.read() if with_body else None
+    except OSError:
+        return None
+    return (etag, body) if etag else None
+
+def _prune_etag_entries(blob_dir: str) -> None:
+    """Delete the oldest cached responses beyond ETAG_MAX_ENTRIES"""
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(blob_dir)
+            if entry.is_file() and not entry.name.endswith(".tmp")
+        ]
+    except OSError as e:
+        print(f"Warning: Failed to prune cached responses: {str(e)}")
+        return
+    if len(entries) <= ETAG_MAX_ENTRIES:
+        return
+    entries.sort()
+    for _, path in entries[: len(entries) - ETAG_MAX_ENTRIES]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def get_etag(url: str) -> Optional[str]:
+    """
+    Get the ETag of a previously cached response
+    
+    Args:
+        url: The requested URL
+        
+    Returns:
+        The ETag or None if the response is not cached
+    """
+    entry = _read_etag_entry(url, with_body=False)
+    return entry[0] if entry else None
+
+def get_etag_body(url: str) -> Optional[bytes]:
+    """
+    Get the cached response body for a URL, e.g. after a 304 Not Modified
+    
+    Args:
+        url: The requested URL
+        
+    Returns:
+        The cached body as bytes or None if not available
+    """
+    entry = _read_etag_entry(url, with_body=True)
+    if entry is None:
+        return None
+    cache_stats["saved_requests"] += 1
+    return entry[1]
+
+def put_etag(url: str, etag: str, body: bytes) -> None:
+    """
+    Cache a response body together with its ETag, in the background
+    
+    Args:
+        url: The requested URL
+        etag: The ETag header of the response
+        body: The raw response body
+    """
+    global _etag_writes
+    body_path = _get_etag_body_path(url)
+    blob_dir = os.path.dirname(body_path)
+    try:
+        os.makedirs(blob_dir, exist_ok=True)
+    except OSError as e:
+        print(f"Warning: Failed to cache response for {url}: {str(e)}")
+        return
+    _write_cache_file(body_path, etag.encode() + b"\n" + body, f"response for {url}")
+
+    with _etag_writes_lock:
+        _etag_writes += 1
+        prune = _etag_writes % _ETAG_PRUNE_INTERVAL == 0
+    if prune:
+        _CACHE_EXECUTOR.submit(_prune_etag_entries, blob_dir)
+
 def get_cache_stats() -> Dict[str, int]:
     """Get cache usage statistics"""
     return cache_stats
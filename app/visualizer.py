@@ -1,22 +1,156 @@
 # app/visualizer.py
-import matplotlib.pyplot as plt
+from matplotlib import colormaps
 import networkx as nx
-import io
 import base64
-from matplotlib.colors import LinearSegmentedColormap
+import hashlib
+import heapq
+import importlib.util
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from operator import itemgetter
 import numpy as np
 
+try:
+    from pybase64 import b64encode as _b64encode
+except ImportError:  # pybase64 is optional, fall back to the standard library
+    _b64encode = base64.b64encode
+
+# The L-BFGS energy method of spring_layout needs networkx 3.5+ and scipy;
+# checked once here instead of failing on every render
+_ENERGY_LAYOUT = (
+    importlib.util.find_spec("scipy") is not None
+    and "method" in inspect.signature(nx.spring_layout).parameters
+)
+
+# Recently rendered graphs, keyed by a hash of everything that shapes the image
+GRAPH_CACHE_SIZE = 16
+_graph_cache = OrderedDict()
+_graph_cache_lock = threading.Lock()
+
+# zlib level of the PNG: 1 encodes several times faster than matplotlib's
+# default of 6 at a somewhat larger size, fine for an interactive preview;
+# use 9 for images that are exported or stored
+PREVIEW_COMPRESS_LEVEL = 1
+
+# Use a nicer color scheme
+_CMAP = colormaps["plasma"]
+
+_LEGEND_TEXT = "Blue: Imported by others\nRed: Imports others\nSize: Total connections"
+
+
+class _Base64Writer:
+    """File-like object that base64-encodes whatever is written to it as it arrives"""
+
+    def __init__(self):
+        self._parts = []
+        self._pending = b""
+
+    def write(self, data):
+        # Encode whole 3-byte groups now and keep the rest for the next write;
+        # all of the input is accepted either way
+        data = bytes(data)
+        size = len(data)
+        buffered = self._pending + data
+        split = len(buffered) - len(buffered) % 3
+        self._pending = buffered[split:]
+        if split:
+            self._parts.append(_b64encode(buffered[:split]))
+        return size
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        """
+        Return everything written so far, base64 encoded
+
+        Returns:
+            str: Base64 text
+        """
+        if self._pending:
+            self._parts.append(_b64encode(self._pending))
+            self._pending = b""
+        return b"".join(self._parts).decode("ascii")
+
+
+def _spring_layout(G):
+    """
+    Compute a spring layout, minimizing its energy with L-BFGS when possible
+
+    Args:
+        G (nx.DiGraph): Graph to lay out
+
+    Returns:
+        dict: Node positions
+    """
+    if _ENERGY_LAYOUT:
+        return nx.spring_layout(G, k=0.15, iterations=50, method="energy")
+    return nx.spring_layout(G, k=0.15, iterations=50)
+
 
-def generate_dependency_graph(dependency_data: dict, max_nodes: int = 30) -> str:
+def generate_dependency_graph(
+    dependency_data: dict,
+    max_nodes: int = 30,
+    dpi: int = 100,
+    compress_level: int = PREVIEW_COMPRESS_LEVEL,
+) -> str:
     """
     Generate a dependency graph visualization from dependency analysis data
 
+    Identical inputs reuse the previously rendered image. Nothing is rendered
+    when no file imports another one of the shown files.
+
+    Args:
+        dependency_data (dict): Output from DependencyAnalyzer
+        max_nodes (int): Maximum number of nodes to show for readability
+        dpi (int): Resolution of the rendered image; the figure is 12x10 inches
+        compress_level (int): zlib compression level of the PNG, from 0 to 9
+
+    Returns:
+        str: Base64 encoded PNG image of the graph, or an empty string if the
+            graph has no edges
+    """
+    relevant_data = {
+        key: dependency_data.get(key)
+        for key in ("imports", "imported_by", "key_files", "entry_points")
+    }
+    key = hashlib.blake2b(
+        json.dumps([relevant_data, max_nodes, dpi, compress_level], sort_keys=True, default=str).encode(),
+        digest_size=16,
+    ).digest()
+
+    with _graph_cache_lock:
+        if key in _graph_cache:
+            _graph_cache.move_to_end(key)
+            return _graph_cache[key]
+
+    image = _render_dependency_graph(dependency_data, max_nodes, dpi, compress_level)
+
+    with _graph_cache_lock:
+        _graph_cache[key] = image
+        while len(_graph_cache) > GRAPH_CACHE_SIZE:
+            _graph_cache.popitem(last=False)
+    return image
+
+
+def _render_dependency_graph(
+    dependency_data: dict, max_nodes: int, dpi: int, compress_level: int
+) -> str:
+    """
+    Render the dependency graph of generate_dependency_graph
+
     Args:
         dependency_data (dict): Output from DependencyAnalyzer
         max_nodes (int): Maximum number of nodes to show for readability
+        dpi (int): Resolution of the rendered image
+        compress_level (int): zlib compression level of the PNG
 
     Returns:
-        str: Base64 encoded PNG image of the graph
+        str: Base64 encoded PNG image of the graph, or an empty string
     """
     # Create a directed graph
     G = nx.DiGraph()
@@ -51,16 +185,19 @@ def generate_dependency_graph(dependency_data: dict, max_nodes: int = 30) -> str
         # If still not enough, add files with most dependencies/dependents
         if len(priority_files) < max_nodes:
             # Sort files by total connections (imports + imported by)
-            connection_counts = {}
-            for file in all_files:
-                import_count = len(imports.get(file, []))
-                imported_by_count = len(imported_by.get(file, []))
-                connection_counts[file] = import_count + imported_by_count
-
-            sorted_files = sorted(
-                connection_counts.items(), key=lambda x: x[1], reverse=True
+            imp_len = {file: len(deps) for file, deps in imports.items()}
+            impby_len = {file: len(deps) for file, deps in imported_by.items()}
+            connection_counts = {
+                file: imp_len.get(file, 0) + impby_len.get(file, 0)
+                for file in all_files
+            }
+
+            # At most max_nodes candidates are looked at: each one is either
+            # already a priority file or fills one of the remaining slots
+            top_files = heapq.nlargest(
+                max_nodes, connection_counts.items(), key=itemgetter(1)
             )
-            for file, _ in sorted_files:
+            for file, _ in top_files:
                 if file not in priority_files:
                     priority_files.add(file)
                     if len(priority_files) >= max_nodes:
@@ -76,51 +213,54 @@ def generate_dependency_graph(dependency_data: dict, max_nodes: int = 30) -> str
             return "/".join([".."] + parts[-3:])
         return path
 
+    # Each shown file is cleaned once and looked up from then on
+    clean = {file: clean_path(file) for file in all_files}
+
     # Add nodes to graph
-    for file in all_files:
-        G.add_node(clean_path(file))
-
-    # Add edges only between files that are in our filtered set
-    for file in all_files:
-        clean_file = clean_path(file)
-        # Add edges for imports
-        for import_file in imports.get(file, []):
-            for target in all_files:
-                # Simple heuristic: if import name is in target path
-                if import_file in target:
-                    G.add_edge(clean_file, clean_path(target))
-
-    # Create a larger figure for better readability
-    plt.figure(figsize=(12, 10))
-
-    # Use a nicer color scheme
-    cmap = plt.cm.plasma
-
-    # Calculate node sizes based on connectivity
-    node_sizes = []
-    node_colors = []
-
-    for node in G.nodes():
-        in_degree = G.in_degree(node) + 1  # Files imported by others
-        out_degree = G.out_degree(node) + 1  # Files that this imports
-
-        # Size based on total connections
-        node_sizes.append(300 * np.log(in_degree + out_degree))
-
-        # Color based on ratio of in to out degree (importers vs importees)
-        if in_degree > out_degree:
-            # More imported by others than imports - bluer
-            node_colors.append(0.3)
-        elif out_degree > in_degree:
-            # Imports more than imported by others - redder
-            node_colors.append(0.7)
-        else:
-            # Balanced - purple
-            node_colors.append(0.5)
+    G.add_nodes_from(clean.values())
+
+    # Add edges only between files that are in our filtered set, using the
+    # importers the dependency analyzer already resolved for each file
+    for target in all_files:
+        for importer in imported_by.get(target, []):
+            if importer in clean:
+                G.add_edge(clean[importer], clean[target])
+
+    # A graph without edges is only a cloud of dots, not worth the layout
+    # and encoding time
+    if G.number_of_edges() == 0:
+        return ""
+
+    # Create a larger figure for better readability; rendered straight to an
+    # Agg canvas, without registering it with pyplot. The constrained layout
+    # is solved while drawing, so no separate tight_layout pass is needed
+    fig = Figure(figsize=(12, 10), dpi=dpi, layout="constrained")
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    # Calculate node sizes based on connectivity, with all nodes at once;
+    # degrees are in node order and offset by one so isolated nodes show up
+    node_count = G.number_of_nodes()
+    in_degree = (
+        np.fromiter((d for _, d in G.in_degree()), dtype=float, count=node_count) + 1
+    )  # Files imported by others
+    out_degree = (
+        np.fromiter((d for _, d in G.out_degree()), dtype=float, count=node_count) + 1
+    )  # Files that this imports
+
+    # Size based on total connections
+    node_sizes = 300 * np.log(in_degree + out_degree)
+
+    # Color based on ratio of in to out degree (importers vs importees):
+    # more imported by others than imports - bluer, imports more than
+    # imported by others - redder, balanced - purple
+    node_colors = np.where(
+        in_degree > out_degree, 0.3, np.where(out_degree > in_degree, 0.7, 0.5)
+    )
 
     # Create layout - try to minimize edge crossings
     try:
-        pos = nx.spring_layout(G, k=0.15, iterations=50)
+        pos = _spring_layout(G)
     except:
         try:
             pos = nx.shell_layout(G)
@@ -129,36 +269,40 @@ def generate_dependency_graph(dependency_data: dict, max_nodes: int = 30) -> str
 
     # Draw the graph
     nx.draw_networkx_nodes(
-        G, pos, node_size=node_sizes, node_color=node_colors, cmap=cmap, alpha=0.8
+        G,
+        pos,
+        node_size=node_sizes,
+        node_color=node_colors,
+        cmap=_CMAP,
+        alpha=0.8,
+        ax=ax,
     )
     nx.draw_networkx_edges(
-        G, pos, edge_color="gray", arrows=True, arrowsize=15, alpha=0.6
+        G, pos, edge_color="gray", arrows=True, arrowsize=15, alpha=0.6, ax=ax
+    )
+    nx.draw_networkx_labels(
+        G, pos, font_size=8, font_color="black", font_weight="bold", ax=ax
     )
-    nx.draw_networkx_labels(G, pos, font_size=8, font_color="black", font_weight="bold")
 
-    plt.title("Code Dependency Graph", fontsize=16, fontweight="bold")
+    ax.set_title("Code Dependency Graph", fontsize=16, fontweight="bold")
 
     # Add legend
-    plt.text(
+    ax.text(
         0.01,
         0.01,
-        "Blue: Imported by others\nRed: Imports others\nSize: Total connections",
-        transform=plt.gca().transAxes,
+        _LEGEND_TEXT,
+        transform=ax.transAxes,
         fontsize=10,
         verticalalignment="bottom",
     )
 
-    plt.axis("off")
-    plt.tight_layout()
-
-    # Save the figure to a BytesIO object
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=300)
-    plt.close()
+    ax.axis("off")
 
-    # Encode the image to base64 for HTML display
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode("utf-8")
+    # Encode the image to base64 for HTML display while it is written, so the
+    # raw PNG is never held in memory as a whole
+    writer = _Base64Writer()
+    canvas.print_png(writer, pil_kwargs={"compress_level": compress_level})
+    img_str = writer.getvalue()
 
     return f"data:image/png;base64,{img_str}"
 
@@ -179,50 +323,47 @@ def generate_dependency_summary(dependency_data: dict) -> str:
     isolated_files = dependency_data.get("isolated_files", [])
     extension_counts = dependency_data.get("extension_counts", {})
 
-    summary = "## Code Dependency Analysis\n\n"
+    parts = ["## Code Dependency Analysis\n\n"]
 
     # Add file type breakdown
-    summary += "### File Type Distribution\n"
-    for ext, count in sorted(
-        extension_counts.items(), key=lambda x: x[1], reverse=True
-    ):
-        if count > 0:
-            summary += f"- {ext}: {count} files\n"
+    parts.append("### File Type Distribution\n")
+    sorted_ext = sorted(extension_counts.items(), key=itemgetter(1), reverse=True)
+    parts.extend(f"- {ext}: {count} files\n" for ext, count in sorted_ext if count > 0)
 
     # Add dependency metrics
-    summary += "\n### Dependency Metrics\n"
-    summary += f"- Total files analyzed: {metrics.get('total_files', 0)}\n"
-    summary += (
+    parts.append("\n### Dependency Metrics\n")
+    parts.append(f"- Total files analyzed: {metrics.get('total_files', 0)}\n")
+    parts.append(
         f"- Average dependencies per file: {metrics.get('avg_dependencies', 0):.2f}\n"
     )
-    summary += f"- Maximum dependencies: {metrics.get('max_dependencies', 0)} (in {metrics.get('file_with_max_dependencies', 'N/A')})\n"
-    summary += (
+    parts.append(f"- Maximum dependencies: {metrics.get('max_dependencies', 0)} (in {metrics.get('file_with_max_dependencies', 'N/A')})\n")
+    parts.append(
         f"- Average dependents per file: {metrics.get('avg_dependents', 0):.2f}\n"
     )
-    summary += f"- Maximum dependents: {metrics.get('max_dependents', 0)} (for {metrics.get('file_with_max_dependents', 'N/A')})\n"
+    parts.append(f"- Maximum dependents: {metrics.get('max_dependents', 0)} (for {metrics.get('file_with_max_dependents', 'N/A')})\n")
 
     # Add key files section
     if key_files:
-        summary += "\n### Key Files (Highest Centrality)\n"
-        for file, centrality in key_files[:5]:  # Show top 5
-            summary += f"- {file} (centrality: {centrality:.3f})\n"
+        parts.append("\n### Key Files (Highest Centrality)\n")
+        parts.extend(
+            f"- {file} (centrality: {centrality:.3f})\n"
+            for file, centrality in key_files[:5]  # Show top 5
+        )
 
     # Add entry points
     if entry_points:
-        summary += "\n### Potential Entry Points\n"
-        for file in entry_points[:5]:  # Show top 5
-            summary += f"- {file}\n"
+        parts.append("\n### Potential Entry Points\n")
+        parts.extend(f"- {file}\n" for file in entry_points[:5])  # Show top 5
 
         if len(entry_points) > 5:
-            summary += f"- ... and {len(entry_points) - 5} more\n"
+            parts.append(f"- ... and {len(entry_points) - 5} more\n")
 
     # Add isolated files if there are any
     if isolated_files:
-        summary += "\n### Isolated Files (No Dependencies)\n"
-        for file in isolated_files[:5]:  # Show top 5
-            summary += f"- {file}\n"
+        parts.append("\n### Isolated Files (No Dependencies)\n")
+        parts.extend(f"- {file}\n" for file in isolated_files[:5])  # Show top 5
 
         if len(isolated_files) > 5:
-            summary += f"- ... and {len(isolated_files) - 5} more\n"
+            parts.append(f"- ... and {len(isolated_files) - 5} more\n")
 
-    return summary
+    return "".join(parts)
@@ -5,6 +5,7 @@
 
 
 from app.gradio_interface import launch_app
+import logging
 import os
 import sys
 
@@ -59,11 +60,10 @@ if __name__ == "__main__":
         share = "--share" in sys.argv
         debug = "--debug" in sys.argv
 
+        # Debug output (e.g. Claude request details) is only formatted when enabled
+        logging.basicConfig(level=logging.DEBUG if debug else logging.INFO)
         if debug:
             print("Debug mode enabled. Detailed logs will be shown.")
-            import logging
-
-            logging.basicConfig(level=logging.DEBUG)
 
         # Launch the app
         print("Launching GitLens interface...")
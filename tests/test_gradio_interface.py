@@ -0,0 +1,326 @@
+import unittest
+from unittest.mock import patch, MagicMock, PropertyMock
+import sys
+import os
+import json
+import asyncio
+import threading
+import requests
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.gradio_interface import (
+    RepoChat,
+    _MAX_RETRY_AFTER,
+    _AnalysisCache,
+    _create_session,
+    _compress_source,
+    _extract_snippet,
+    _max_tokens_for,
+)
+
+
+class TestPromptHelpers(unittest.TestCase):
+    """Test cases for the prompt building helpers of the chat interface"""
+
+    def test_compress_source_python(self):
+        """Test that Python code keeps its statements but loses comments, blanks and long docstrings"""
+        content = (
+            "import os\n"
+            "\n"
+            "# A comment\n"
+            "def hello():\n"
+            "    '''Say hello.\n"
+            "\n"
+            "    Longer description.\n"
+            "    '''\n"
+            "    return os.sep\n"
+        )
+
+        compressed = _compress_source(content, "app/hello.py")
+
+        self.assertEqual(
+            compressed,
+            'import os\ndef hello():\n    """Say hello."""\n    return os.sep',
+        )
+
+    def test_compress_source_unknown_language(self):
+        """Test that files in languages without comment rules are left untouched"""
+        content = "# Title\n\nSome text\n"
+        self.assertEqual(_compress_source(content, "README.md"), content)
+
+    def test_extract_snippet_keeps_relevant_blocks(self):
+        """Test that oversized files are cut down to the blocks matching the question"""
+        filler = "".join(
+            f"def helper_{i}():\n" + "    value = 1\n" * 50 for i in range(10)
+        )
+        content = filler + "def parse_config(path):\n    return open(path).read()\n"
+
+        snippet = _extract_snippet(content, "How does parse_config work?", 200, "app/config.py")
+
+        self.assertEqual(
+            snippet, "...\ndef parse_config(path):\n    return open(path).read()\n"
+        )
+
+    def test_history_summarizes_older_turns(self):
+        """Test that only the newest turns are sent verbatim and older ones are summarized"""
+        chat = RepoChat()
+        chat.chat_history = [
+            (f"Question {i}. With more detail", f"Answer {i}. With more detail")
+            for i in range(8)
+        ]
+
+        messages = chat._build_history_messages("system", "question")
+
+        self.assertEqual(len(messages), 16)
+        self.assertEqual(messages[0]["content"], "Question 0. [...]")
+        self.assertEqual(messages[-1]["content"], "Answer 7. With more detail")
+        self.assertEqual(messages[-2]["content"], "Question 7. With more detail")
+        self.assertEqual(messages[5]["content"], "Answer 2. [...]")
+        self.assertEqual(messages[6]["content"], "Question 3. With more detail")
+
+    def test_long_history_is_folded_into_a_summary(self):
+        """Test that older turns are folded into one summary once the history grows too large"""
+        chat = RepoChat()
+        long_answer = "Answer. " + "x" * 4000
+        for i in range(10):
+            chat._record_turn(f"Question {i}. Details", long_answer)
+
+        messages = chat._build_history_messages("system", "question")
+
+        self.assertEqual(len(chat.chat_history), 10)
+        self.assertEqual(chat._summarized_turns, 6)
+        self.assertTrue(
+            messages[0]["content"].startswith("Summary of our earlier conversation:")
+        )
+        self.assertIn("- User: Question 0.", messages[0]["content"])
+        self.assertEqual(len(messages), 2 + 2 * 4)
+        self.assertEqual(messages[2]["content"], "Question 6. Details")
+
+    def test_chat_history_is_bounded(self):
+        """Test that only the newest turns are kept while exports still notice new turns"""
+        chat = RepoChat()
+        for i in range(250):
+            chat._record_turn(f"Question {i}.", f"Answer {i}.")
+
+        self.assertEqual(len(chat.chat_history), 200)
+        self.assertEqual(chat.chat_history[0], ("Question 50.", "Answer 50."))
+        self.assertLessEqual(chat._summarized_turns, len(chat.chat_history))
+
+        export = chat.get_full_conversation()
+        chat._record_turn("Question 250.", "Answer 250.")
+        self.assertNotEqual(chat.get_full_conversation(), export)
+
+    def test_max_tokens_depends_on_question(self):
+        """Test that short factual questions get a smaller answer budget than open ones"""
+        self.assertEqual(_max_tokens_for("What language is this?"), 300)
+        self.assertEqual(_max_tokens_for("Does it use Docker?"), 300)
+        self.assertEqual(_max_tokens_for("What is the architecture?"), 1500)
+        self.assertEqual(_max_tokens_for("How does the analyzer build the tree?"), 1500)
+
+
+class TestClaudeStreaming(unittest.TestCase):
+    """Test cases for streaming Claude responses"""
+
+    @patch("app.gradio_interface.load_env", return_value={"API_KEY": "test-key"})
+    def test_stream_claude_accumulates_text_deltas(self, mock_load_env):
+        """Test that text deltas from the event stream are yielded as a growing response"""
+        chat = RepoChat()
+        chat.repo_analysis = {"repo_info": {"name": "repo"}}
+        chat._system_prompt_static = "Repository context"
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = [
+            b"event: content_block_delta",
+            b'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Hello"}}',
+            b"",
+            b'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": " world"}}',
+            b'data: {"type": "message_stop"}',
+        ]
+        chat._http = MagicMock()
+        chat._http.post.return_value.__enter__.return_value = mock_response
+
+        chunks = list(
+            chat.stream_claude("What does it do?", MagicMock(), status_updates=["a", "b", "c"])
+        )
+
+        self.assertEqual(chunks, ["Hello", "Hello world"])
+        self.assertTrue(chat._http.post.call_args.kwargs["stream"])
+        self.assertEqual(list(chat.chat_history), [])
+        chat._http.post.return_value.__exit__.assert_called_once()
+
+    @patch("app.gradio_interface.load_env", return_value={"API_KEY": "test-key"})
+    def test_stream_claude_keeps_partial_answer_on_broken_stream(self, mock_load_env):
+        """Test that a stream breaking off keeps the text received so far"""
+        chat = RepoChat()
+        chat.repo_analysis = {"repo_info": {"name": "repo"}}
+        chat._system_prompt_static = "Repository context"
+
+        def lines():
+            yield b'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Hello"}}'
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+        mock_response = MagicMock()
+        mock_response.iter_lines.return_value = lines()
+        type(mock_response).text = PropertyMock(side_effect=AssertionError("body read"))
+        chat._http = MagicMock()
+        chat._http.post.return_value.__enter__.return_value = mock_response
+
+        chunks = list(
+            chat.stream_claude("What does it do?", MagicMock(), status_updates=["a", "b", "c"])
+        )
+
+        self.assertEqual(
+            chunks,
+            ["Hello", "Hello\n\nError querying Claude API: Connection broken"],
+        )
+
+    @patch("app.gradio_interface.load_env", return_value={"API_KEY": "test-key"})
+    def test_stream_claude_shows_error_details_after_retries(self, mock_load_env):
+        """Test that a rate limited request reports Claude's error body once retries run out"""
+        retry = _create_session().get_adapter("https://api.anthropic.com").max_retries
+        self.assertFalse(retry.raise_on_status)
+        self.assertIn(529, retry.status_forcelist)
+        rate_limited_headers = MagicMock()
+        rate_limited_headers.headers = {"Retry-After": "3600"}
+        self.assertEqual(retry.get_retry_after(rate_limited_headers), _MAX_RETRY_AFTER)
+
+        # What the session returns for a 429 that persists through its retries
+        response = requests.Response()
+        response.status_code = 429
+        response.reason = "Too Many Requests"
+        response.url = "https://api.anthropic.com/v1/messages"
+        response._content = b'{"error": {"type": "rate_limit_error"}}'
+        response._content_consumed = True
+
+        chat = RepoChat()
+        chat.repo_analysis = {"repo_info": {"name": "repo"}}
+        chat._system_prompt_static = "Repository context"
+        chat._http = MagicMock()
+        chat._http.post.return_value = response
+
+        chunks = list(
+            chat.stream_claude("What does it do?", MagicMock(), status_updates=["a", "b", "c"])
+        )
+
+        self.assertEqual(len(chunks), 1)
+        self.assertIn("429 Client Error", chunks[0])
+        self.assertIn('Details: {"error": {"type": "rate_limit_error"}}', chunks[0])
+
+    @patch("app.gradio_interface.load_env", return_value={"API_KEY": "test-key"})
+    def test_stream_claude_includes_each_mentioned_file_once(self, mock_load_env):
+        """Test that a file mentioned several times is only added to the prompt once"""
+        chat = RepoChat()
+        chat.repo_analysis = {"repo_info": {"name": "repo"}}
+        chat._system_prompt_static = "Repository context"
+        chat.file_contents = {"app/main.py": "print('hi')\n"}
+        chat._basename_index = chat._build_basename_index(chat.file_contents)
+
+        chat._http = MagicMock()
+        chat._http.post.return_value.iter_lines.return_value = []
+
+        list(
+            chat.stream_claude(
+                "What do `main.py` and app/main.py do? Is main.py tested?",
+                MagicMock(),
+                status_updates=["a", "b", "c"],
+            )
+        )
+
+        payload = json.loads(chat._http.post.call_args.kwargs["data"])
+        system_message = payload["system"]
+        self.assertEqual(system_message.count("Content of file 'app/main.py'"), 1)
+
+    def test_blank_and_repeated_questions_skip_the_api(self):
+        """Test that blank messages and immediate resubmissions don't call Claude"""
+        chat = RepoChat()
+        chat.repo_analysis = {"repo_info": {"name": "repo"}}
+        chat._http = MagicMock()
+
+        self.assertEqual(chat.query_claude("   ", MagicMock()), "Please enter a question.")
+
+        chat._record_turn("What does it do?", "It analyzes repositories.")
+        self.assertEqual(
+            chat.query_claude("What does it do? ", MagicMock()),
+            "It analyzes repositories.",
+        )
+        chat._http.post.assert_not_called()
+        self.assertEqual(len(chat.chat_history), 1)
+
+    def test_question_in_flight_is_not_sent_twice(self):
+        """Test that a repeat of the question being answered is ignored"""
+        chat = RepoChat()
+        chat.repo_analysis = {"repo_info": {"name": "repo"}}
+
+        with patch.object(
+            chat, "stream_claude", return_value=iter(["Partial", "Answer"])
+        ) as mock_stream:
+            first = chat.chat("What does it do?", [])
+            next(first)
+            next(first)
+
+            second = list(chat.chat("What does it do? ", []))
+            self.assertEqual(second, [([], "Ready to answer more questions.")])
+
+            list(first)
+        mock_stream.assert_called_once()
+        self.assertIsNone(chat._pending_question)
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """Test cases for reusing finished repository analyses"""
+
+    @patch("app.analyzer.analyze_code_quality", return_value=None)
+    @patch("app.analyzer.analyze_repo")
+    @patch("app.analyzer.get_head_commit_sha", return_value="abc123")
+    def test_same_commit_is_analyzed_once(self, mock_sha, mock_analyze_repo, mock_quality):
+        """Test that a second analysis of an unchanged repository comes from the cache"""
+        mock_analyze_repo.return_value = {
+            "folder_structure": "repo/",
+            "frameworks": [],
+            "file_contents": {},
+            "additional_info": {},
+        }
+        chat = RepoChat()
+        chat._analysis_cache = _AnalysisCache()
+        url = "https://github.com/owner/repo"
+
+        asyncio.run(chat.analyze_repository_with_progress(url, progress=MagicMock()))
+        asyncio.run(chat.analyze_repository_with_progress(url, progress=MagicMock()))
+        self.assertEqual(mock_analyze_repo.call_count, 1)
+
+        asyncio.run(
+            chat.analyze_repository_with_progress(
+                url, force_refresh=True, progress=MagicMock()
+            )
+        )
+        self.assertEqual(mock_analyze_repo.call_count, 2)
+        self.assertFalse(mock_analyze_repo.call_args.kwargs["use_cache"])
+
+    @patch("app.analyzer.analyze_repo")
+    def test_progress_is_reported_from_the_event_loop(self, mock_analyze_repo):
+        """Test that progress from the analysis threads reaches the bar on one thread"""
+        def analyze_repo(repo_url, progress_cb=None, **kwargs):
+            progress_cb(0.5, "Fetching files...")
+            return {"file_contents": {}}
+
+        mock_analyze_repo.side_effect = analyze_repo
+        progress_threads = []
+
+        def progress(fraction, desc=None):
+            progress_threads.append(threading.get_ident())
+
+        chat = RepoChat()
+        asyncio.run(
+            chat._run_analysis(
+                "https://github.com/owner/repo", None, False, False, 10, False, progress
+            )
+        )
+
+        self.assertEqual(progress_threads, [threading.get_ident()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import json
+import base64
+import tempfile
+import time
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import plagiarism_detector, utils
+from app.plagiarism_detector import PlagiarismDetector
+
+
+class TestPlagiarismDetector(unittest.TestCase):
+    """Test cases for the plagiarism detector module"""
+
+    def setUp(self):
+        plagiarism_detector._check_cache.clear()
+
+    def test_detect_plagiarism_keeps_file_order(self):
+        """Test that files downloaded in parallel are reported in their original order"""
+        detector = PlagiarismDetector()
+        code_files = [
+            {"path": f"src/file_{i}.py", "download_url": f"url/{i}", "size": 200}
+            for i in range(5)
+        ]
+        proprietary = "# CONFIDENTIAL\n" + "x = 1\n" * 50
+
+        with patch.object(detector, "_get_code_files", return_value=code_files):
+            with patch.object(detector, "_get_file_content", return_value=proprietary):
+                progress_cb = MagicMock()
+                results = detector.detect_plagiarism(
+                    "https://github.com/owner/repo", progress_cb=progress_cb
+                )
+
+        self.assertTrue(results["plagiarism_detected"])
+        self.assertEqual(
+            [item["file"] for item in results["suspicious_files"]],
+            [file_info["path"] for file_info in code_files],
+        )
+        self.assertEqual(progress_cb.call_count, 5)
+
+    def test_identical_files_are_checked_once(self):
+        """Test that copies of the same file share a single check"""
+        detector = PlagiarismDetector()
+        license_header = "# Licensed under the MIT License\n" + "x = 1\n" * 30
+        items = [
+            ("a/setup.py", license_header),
+            ("b/setup.py", license_header),
+            ("c/main.py", "print('hello')\n" * 20),
+            ("d/setup.js", license_header),
+        ]
+
+        with patch.object(
+            detector, "_check_file_plagiarism", wraps=detector._check_file_plagiarism
+        ) as mock_check:
+            checks = detector._check_files(items)
+
+        self.assertEqual(len(checks), 4)
+        self.assertEqual(mock_check.call_count, 3)
+        self.assertEqual(checks[0], checks[1])
+
+        # Checking the same files again only hits the cache
+        with patch.object(detector, "_check_file_plagiarism") as mock_check:
+            self.assertEqual(detector._check_files(items), checks)
+        mock_check.assert_not_called()
+
+    def test_calculate_entropy(self):
+        """Test that entropy is the Shannon entropy of the characters in bits"""
+        detector = PlagiarismDetector()
+        self.assertEqual(detector._calculate_entropy(""), 0.0)
+        self.assertEqual(detector._calculate_entropy("aaaa"), 0.0)
+        self.assertAlmostEqual(detector._calculate_entropy("aabb"), 1.0)
+        self.assertAlmostEqual(detector._calculate_entropy("abcdefgh"), 3.0)
+
+    def test_signature_precedence_with_overlapping_matches(self):
+        """Test that an earlier listed signature wins even inside a later one's match"""
+        detector = PlagiarismDetector()
+        result = detector._check_code_signatures("@author Bob Copyright (c) Acme 2020")
+        self.assertEqual(result["match_type"], "Copyright Mismatch")
+        self.assertEqual(result["confidence"], 0.7)
+
+    def test_obfuscation_check_ignores_descriptive_names(self):
+        """Test that idiomatic camelCase code is not flagged while obfuscated code is"""
+        detector = PlagiarismDetector()
+        form_handler = (
+            "const submitButton = document.getElementById('submit');\n"
+            "function handleSubmitButton(event) {\n"
+            "    event.preventDefault();\n"
+            "    const formData = new FormData(event.target);\n"
+            "    let validationErrors = validateEmail(formData.get('email'));\n"
+            "    return sendRequest(formData, validationErrors);\n"
+            "}\n"
+            "function parseConfigFile(configText) {\n"
+            "    const parsedConfig = JSON.parse(configText);\n"
+            "    return parsedConfig;\n"
+            "}\n"
+        )
+        obfuscated = (
+            "var _0x4f2a = ['log', 'hello'];\n"
+            "function xK9qZ(hJ7tR2mN) { var bT4fW = _0x4f2a[0]; }\n"
+            "var qZ0xK8wYp3Lm7Vb = xK9qZ;\n"
+            "let Xv9Lq = 1;\n"
+        )
+
+        self.assertFalse(detector._check_obfuscation(form_handler))
+        result = detector._check_file_plagiarism("src/form.js", form_handler)
+        self.assertFalse(result["is_suspicious"])
+        self.assertTrue(detector._check_obfuscation(obfuscated))
+
+    def test_check_obfuscation_stops_once_decided(self):
+        """Test that names stop being scored once the 30% threshold is settled"""
+        detector = PlagiarismDetector()
+        random_names = " ".join(f"var qZ{i}xK8wYp3Lm7Vb;" for i in range(10))
+        plain_names = " ".join(f"var value{i};" for i in range(90))
+
+        with patch.object(
+            detector, "_calculate_entropy", wraps=detector._calculate_entropy
+        ) as mock_entropy:
+            self.assertFalse(detector._check_obfuscation(plain_names + " " + random_names))
+            self.assertLess(mock_entropy.call_count, 100)
+
+        many_random_names = " ".join(f"var qZ{i}xK8wYp3Lm7Vb;" for i in range(40))
+        self.assertTrue(
+            detector._check_obfuscation(many_random_names + " " + plain_names)
+        )
+
+    def test_get_code_files_uses_raw_download_urls(self):
+        """Test that files are downloaded from the raw host of the branch that exists"""
+        detector = PlagiarismDetector()
+        tree = {"tree": [{"type": "blob", "path": "src/my app.py", "size": 500}]}
+
+        with patch.object(
+            detector, "_cached_get", side_effect=[(404, b""), (200, json.dumps(tree).encode())]
+        ):
+            code_files = detector._get_code_files(
+                "https://api.github.com/repos/owner/repo", 10
+            )
+
+        self.assertEqual(
+            code_files[0]["download_url"],
+            "https://raw.githubusercontent.com/owner/repo/master/src/my%20app.py",
+        )
+        self.assertEqual(
+            code_files[0]["api_url"],
+            "https://api.github.com/repos/owner/repo/contents/src/my%20app.py?ref=master",
+        )
+
+    def test_get_file_content_skips_binary_files(self):
+        """Test that decoded files are capped in size and binary files are skipped"""
+        detector = PlagiarismDetector()
+
+        def api_body(data):
+            return json.dumps(
+                {"content": base64.b64encode(data).decode(), "encoding": "base64"}
+            ).encode()
+
+        response = MagicMock(status_code=200, headers={}, content=b"a" * 300000)
+        detector._session.get = MagicMock(return_value=response)
+        with patch("app.plagiarism_detector.get_etag", return_value=None):
+            self.assertEqual(len(detector._get_file_content("raw_url")), 200000)
+
+        with patch.object(detector, "_cached_get", return_value=(200, b"\x89PNG\x00\x00")):
+            self.assertIsNone(detector._get_file_content("raw_url"))
+
+        with patch.object(
+            detector,
+            "_cached_get",
+            side_effect=[(404, b""), (200, api_body(b"\x89PNG\x00\x00"))],
+        ):
+            self.assertIsNone(detector._get_file_content("raw_url", "api_url"))
+
+    def test_fuzzy_matching_finds_lightly_edited_known_code(self):
+        """Test that known code is found by fingerprint after renames and reformatting"""
+        detector = PlagiarismDetector()
+        edited = (
+            "// Helpers\n"
+            "export function debounce(fn, delay) {\n"
+            "  let timeout;\n"
+            "  return function () {\n"
+            "    const context = this, args = arguments;\n"
+            "    clearTimeout(timeout);\n"
+            "    timeout = setTimeout(function () {\n"
+            "      fn.apply(context, args);\n"
+            "    }, delay);\n"
+            "  };\n"
+            "}\n"
+        )
+        original = "export function add(a, b) {\n  return a + b;\n}\n" * 5
+
+        self.assertEqual(
+            detector._apply_fuzzy_matching(".js", edited)["match_type"],
+            "Similar Code",
+        )
+        self.assertFalse(
+            detector._apply_fuzzy_matching(".js", original)["is_suspicious"]
+        )
+
+    def test_unchanged_file_is_served_from_etag_cache(self):
+        """Test that a 304 response reuses the body cached with the ETag"""
+        fresh_response = MagicMock()
+        fresh_response.status_code = 200
+        fresh_response.headers = {"ETag": '"abc"'}
+        fresh_response.content = b"print('hello')"
+        not_modified_response = MagicMock()
+        not_modified_response.status_code = 304
+        not_modified_response.headers = {}
+        not_modified_response.content = b""
+
+        detector = PlagiarismDetector()
+        mock_get = MagicMock(side_effect=[fresh_response, not_modified_response])
+        detector._session.get = mock_get
+        url = "https://raw.githubusercontent.com/owner/repo/main/app.py"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch("app.utils.get_cache_dir", return_value=cache_dir):
+                self.assertEqual(detector._cached_get(url), (200, b"print('hello')"))
+                # Wait for the background cache write
+                utils._CACHE_EXECUTOR.submit(lambda: None).result()
+                self.assertEqual(detector._cached_get(url), (200, b"print('hello')"))
+
+        self.assertIsNone(mock_get.call_args_list[0].kwargs["headers"])
+        self.assertEqual(mock_get.call_args_list[1].kwargs["headers"]["If-None-Match"], '"abc"')
+
+    def test_etag_cache_is_bounded(self):
+        """Test that expired cached responses are ignored and the oldest are pruned"""
+        url = "https://raw.githubusercontent.com/owner/repo/main/app.py"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch("app.utils.get_cache_dir", return_value=cache_dir):
+                utils.put_etag(url, '"abc"', b"print('hello')")
+                utils._CACHE_EXECUTOR.submit(lambda: None).result()
+                self.assertEqual(utils.get_etag(url), '"abc"')
+
+                old = time.time() - utils.ETAG_MAX_AGE - 60
+                os.utime(utils._get_etag_body_path(url), (old, old))
+                self.assertIsNone(utils.get_etag(url))
+                self.assertIsNone(utils.get_etag_body(url))
+
+                with patch("app.utils.ETAG_MAX_ENTRIES", 1):
+                    utils.put_etag(url + "?v=2", '"def"', b"print('bye')")
+                    utils._CACHE_EXECUTOR.submit(lambda: None).result()
+                    utils._prune_etag_entries(os.path.dirname(utils._get_etag_body_path(url)))
+                self.assertFalse(os.path.exists(utils._get_etag_body_path(url)))
+                self.assertEqual(utils.get_etag_body(url + "?v=2"), b"print('bye')")
+
+    def test_etag_cache_keeps_line_endings(self):
+        """Test that a cached body with CRLF line endings comes back unchanged"""
+        url = "https://raw.githubusercontent.com/owner/repo/main/windows.py"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch("app.utils.get_cache_dir", return_value=cache_dir):
+                utils.put_etag(url, '"e1"', b"line1\r\nline2\r\n")
+                utils._CACHE_EXECUTOR.submit(lambda: None).result()
+                self.assertEqual(utils.get_etag(url), '"e1"')
+                self.assertEqual(utils.get_etag_body(url), b"line1\r\nline2\r\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
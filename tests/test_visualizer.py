@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import base64
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import visualizer
+from app.visualizer import generate_dependency_graph
+
+
+class TestVisualizer(unittest.TestCase):
+    """Test cases for the dependency graph visualizer module"""
+
+    def setUp(self):
+        visualizer._graph_cache.clear()
+
+    @patch("app.visualizer.nx.draw_networkx_edges")
+    def test_graph_edges_follow_resolved_imports(self, mock_draw_edges):
+        """Test that edges come from the importers resolved by the dependency analyzer"""
+        dependency_data = {
+            "imports": {
+                "app/main.py": ["utils", "os"],
+                "app/hosts.py": ["utils"],
+            },
+            "imported_by": {
+                "app/utils.py": ["app/main.py", "app/hosts.py"],
+            },
+        }
+
+        image = generate_dependency_graph(dependency_data)
+
+        graph = mock_draw_edges.call_args[0][0]
+        self.assertEqual(
+            sorted(graph.edges()),
+            [("app/hosts.py", "app/utils.py"), ("app/main.py", "app/utils.py")],
+        )
+        self.assertTrue(image.startswith("data:image/png;base64,"))
+
+    def test_identical_graphs_are_rendered_once(self):
+        """Test that the same dependency data reuses the rendered image"""
+        dependency_data = {
+            "imports": {"app/main.py": ["utils"]},
+            "imported_by": {"app/utils.py": ["app/main.py"]},
+        }
+
+        with patch(
+            "app.visualizer._render_dependency_graph", return_value="data:image/png;base64,"
+        ) as mock_render:
+            generate_dependency_graph(dependency_data)
+            generate_dependency_graph(dict(dependency_data))
+            self.assertEqual(mock_render.call_count, 1)
+
+            generate_dependency_graph(dependency_data, max_nodes=10)
+            self.assertEqual(mock_render.call_count, 2)
+
+    def test_graph_without_edges_is_not_rendered(self):
+        """Test that an empty string is returned when no file imports another"""
+        dependency_data = {
+            "imports": {"app/main.py": ["os", "sys"]},
+            "imported_by": {},
+        }
+
+        with patch("app.visualizer.nx.draw_networkx_nodes") as mock_draw:
+            self.assertEqual(generate_dependency_graph(dependency_data), "")
+            self.assertEqual(generate_dependency_graph({}), "")
+            mock_draw.assert_not_called()
+
+    def test_base64_writer_accepts_all_input(self):
+        """Test that every write reports its whole input as written"""
+        writer = visualizer._Base64Writer()
+        self.assertEqual(writer.write(b"ab"), 2)
+        self.assertEqual(writer.write(b"cdefg"), 5)
+        self.assertEqual(writer.getvalue(), base64.b64encode(b"abcdefg").decode())
+
+
+if __name__ == "__main__":
+    unittest.main()